@@ -6,108 +6,149 @@
 # Date Modified: 2025/7/23
 # Program Name: AudioTrackProcessing
 
-import os, logging, filetype
+import os, time, logging, filetype, functools
 
 from datetime import datetime
 from mutagen.id3 import ID3, TPE1, TIT3, TPUB, TDRC, TCOP, APIC, TENC, WOAR
 
 # 全局变量
+DEFAULT_PADDING = 1024
 DEFAULT_ENCODER = "YKDX"
 DEFAULT_PUBLISHER = "YKDX"
 DEFAULT_ARTIST = "EOZT-YKDX出品"
 DEFAULT_COPYRIGHT = "©EOZT 2021-2025"
 DEFAULT_AUTHOR_URL = "https://github.com/EOZT-YKDX"
+# 发布年份在单次运行中不变，只需格式化一次
+RELEASE_YEAR = str(datetime.now().year)
+
+# 加载封面
+@functools.lru_cache(maxsize=4)
+def load_cover(audio_covers: str, modified_time: int) -> bytes:
+    """
+    读取封面文件数据，按路径与修改时间缓存，封面修改后重新读取。
+    :param audio_covers: 封面文件路径。
+    :param modified_time: 封面文件的修改时间，只用作缓存键。
+    :return: 封面图片数据。
+    """
+
+    # 按文件大小一次读取，不经过缓冲读取器
+    covers_fd = os.open(audio_covers, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+
+    try:
+        return os.read(covers_fd, os.fstat(covers_fd).st_size)
+    finally:
+        os.close(covers_fd)
+
+
+# 读取封面
+def read_cover(audio_covers: str, logger: logging.Logger) -> tuple[bytes, str] | None:
+    """
+    读取并校验封面图片，批量处理时只需读取一次。
+    :param logger: 日志记录器。
+    :param audio_covers: 封面文件路径。
+    :return: 封面图片数据与MIME类型，读取失败时返回None
+    """
+
+    try:
+        cover_data = load_cover(audio_covers, os.stat(audio_covers).st_mtime_ns)
+    except FileNotFoundError:
+        logger.error("封面文件路径无效: %s", audio_covers)
+        return None
+    except Exception as error:
+        logger.error("封面文件读取失败: %s - %s", audio_covers, error)
+        return None
+
+    # 根据已读取的文件头判断类型，无需再次打开文件
+    if not filetype.is_image(cover_data):
+        logger.error("封面文件类型无效: %s - %s", filetype.guess_mime(cover_data), audio_covers)
+        return None
+
+    return cover_data, filetype.guess_mime(cover_data)
+
+
+# 构建音轨标签
+def build_track_frames(track_information: dict, cover_data: bytes, covers_type: str) -> list:
+    """
+    构建写入音频文件的标签帧，与具体文件无关，标签值在此转换为字符串。
+    :param track_information: 音轨元数据的字典。
+    :param cover_data: 封面图片数据。
+    :param covers_type: 封面图片的MIME类型。
+    :return: 标签帧列表。
+    """
+
+    return [
+        # 发布年份
+        TDRC(encoding=3, text=[RELEASE_YEAR]),
+        # 艺术家
+        TPE1(encoding=3, text=[str(track_information.get("Artist", DEFAULT_ARTIST))]),
+        # 编码人员
+        TENC(encoding=3, text=str(track_information.get("Encoder", DEFAULT_ENCODER))),
+        # 音轨封面
+        APIC(type=3, encoding=3, desc="Cover", data=cover_data, mime=covers_type),
+        # 发布者
+        TPUB(encoding=3, text=str(track_information.get("Publisher", DEFAULT_PUBLISHER))),
+        # 作者URL
+        WOAR(encoding=3, url=str(track_information.get("Author_URL", DEFAULT_AUTHOR_URL))),
+        # 音轨版权
+        TCOP(encoding=3, text=[str(track_information.get("Copyright", DEFAULT_COPYRIGHT))]),
+    ]
+
 
 # 音轨处理
-def audio_track_processing(input_file: str, logger: logging.Logger, track_information: dict) -> None:
+def audio_track_processing(input_file: str, logger: logging.Logger, track_information: dict, cover: tuple[bytes, str] | None = None, track_frames: list | None = None) -> None:
     """
     处理音频文件的音轨信息。
     :param logger: 日志记录器。
     :param input_file: 音频文件路径。
     :param track_information: 音轨元数据的字典。
+    :param cover: 预先读取的封面数据与MIME类型，为空时从track_information的封面路径读取。
+    :param track_frames: 预先构建的标签帧，批量处理时共用，为空时根据封面构建。
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     file_name = os.path.basename(input_file)
-    audio_covers = track_information.get("Cover", "")
 
     # 加载音频文件
     try:
         audio_file = ID3(input_file)
     except Exception as error:
-        logger.error(f"音频文件加载失败: {file_name} - {error}")
+        logger.error("音频文件加载失败: %s - %s", file_name, error)
         return
 
-    try:
-        # 获取封面文件类型
-        covers_type = filetype.guess_mime(audio_covers)
+    if track_frames is None:
+        if cover is None:
+            cover = read_cover(audio_covers=track_information.get("Cover", ""), logger=logger)
 
-        # 检查封面文件类型是否为图片
-        if not filetype.is_image(audio_covers):
-            logger.error(f"封面文件类型无效: {covers_type} - {file_name}")
-            return
+            if cover is None:
+                logger.error("封面读取失败，跳过音轨处理: %s", file_name)
+                return
 
-        # 读取封面
-        with open(mode="rb", file=audio_covers) as covers_file:
-            cover_data = covers_file.read()
-    except FileNotFoundError:
-        logger.error(f"封面文件路径无效: {file_name}")
-        return
-    except Exception as error:
-        logger.error(f"封面文件读取失败: {file_name} - {error}")
-        return
+        cover_data, covers_type = cover
+        track_frames = build_track_frames(track_information=track_information, cover_data=cover_data, covers_type=covers_type)
 
-    # 将标签值转换为字符串
-    for key, value in track_information.items():
-        track_information[key] = str(value)
-
-    # 删除旧标签
-    for tag in ["TDRC", "TPE1", "TENC", "TPUB", "TCOP", "APIC", "WOAR"]:
-        audio_file.delall(tag)
+    # 标签已完全一致时无需保存，避免重写文件
+    if "TIT3" in audio_file and all(audio_file.getall(frame.FrameID) == [frame] for frame in track_frames):
+        logger.debug("音轨信息无变化，跳过保存: %s", file_name)
+        return
 
     # 设置文件的源名称，过滤已下载的音频
-    if not audio_file.getall("TIT3"):
+    if "TIT3" not in audio_file:
         audio_file.add(
             TIT3(encoding=3, text=os.path.splitext(file_name)[0])
         )
 
-    # 设置发布年份
-    audio_file.add(
-        TDRC(encoding=3, text=[str(datetime.now().year)])
-    )
-    # 设置艺术家
-    audio_file.add(
-        TPE1(encoding=3, text=[track_information.get("Artist", DEFAULT_ARTIST)])
-    )
-    # 设置编码人员
-    audio_file.add(
-        TENC(encoding=3, text=track_information.get("Encoder", DEFAULT_ENCODER))
-    )
-    # 设置音轨封面
-    audio_file.add(
-        APIC(type=3, encoding=3, desc="Cover", data=cover_data, mime=covers_type)
-    )
-    # 设置发布者
-    audio_file.add(
-        TPUB(encoding=3, text=track_information.get("Publisher", DEFAULT_PUBLISHER))
-    )
-    # 设置作者URL
-    audio_file.add(
-        WOAR(encoding=3, url=track_information.get("Author_URL", DEFAULT_AUTHOR_URL))
-    )
-    # 设置音轨版权
-    audio_file.add(
-        TCOP(encoding=3, text=[track_information.get("Copyright", DEFAULT_COPYRIGHT)])
-    )
+    # 覆盖旧标签，无需先删除再添加，保存时只读取标签帧，可在文件之间共用
+    for frame in track_frames:
+        audio_file.setall(frame.FrameID, [frame])
 
-    # 保存音轨信息
+    # 保存音轨信息，保留填充空间，后续修改标签时无需重写整个文件
     try:
-        audio_file.save(v2_version=3)
+        audio_file.save(v2_version=3, padding=lambda info: max(DEFAULT_PADDING, info.padding))
     except Exception as error:
-        logger.error(f"音轨标签保存失败: {file_name} - {error}")
+        logger.error("音轨标签保存失败: %s - %s", file_name, error)
 
-    logger.info(f"音轨信息处理完成 - {file_name} - 累计时长: {datetime.now() - start_time}")
+    logger.info("音轨信息处理完成 - %s - 累计时长: %.3f秒", file_name, time.perf_counter() - start_time)
     pass
 
 
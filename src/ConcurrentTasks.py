@@ -5,47 +5,205 @@
 # Date Modified: 2025/7/27
 # Program Name: ConcurrentTasks
 
-import os, logging, tempfile, concurrent
+import os, time, shutil, logging, tempfile, threading, functools, concurrent
 
-from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
 from FileCompression import AudioCompressor
 from NetworkOperations import download_video
-from DataProcessing import download_processing
-from AudioTrackProcessing import audio_track_processing
+from DataProcessing import FAILED_DIR, DEFAULT_THREADS, download_processing
+from AudioTrackProcessing import read_cover, build_track_frames, audio_track_processing
+
+# 全局变量
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_PROCESSING_WORKERS = os.cpu_count() or 1
+DEFAULT_CONCURRENCY_TUNER = {
+    "Initial": DEFAULT_DOWNLOAD_WORKERS, # 初始并发数量
+    "Minimum": 2, # 最低并发数量
+    "Maximum": 16, # 最高并发数量
+    "Window": 5, # 吞吐量统计窗口，单位为秒
+}
+# 下载任务与并发处理所需的配置项
+PROCESS_KEYS = frozenset(["video_name", "output_path", "download_url", "audio_format", "track_information"])
+CONCURRENT_KEYS = frozenset(["url_list", "name_list", "output_path", "audio_format", "track_information"])
+# 每个压缩线程持有各自的压缩器
+THREAD_LOCAL = threading.local()
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial: int, minimum: int, maximum: int, window: float):
+        """
+        根据下载吞吐量动态调整并发数量的限流器
+        :param initial: 初始并发数量
+        :param minimum: 最低并发数量
+        :param maximum: 最高并发数量
+        :param window: 吞吐量统计窗口，单位为秒
+        """
+
+        self.active = 0
+        self.last_rate = 0.0
+        self.window_bytes = 0
+        self.window = window
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.window_start = time.monotonic()
+        self.condition = threading.Condition()
+
+
+    def record(self, size: int):
+        """记录已下载的字节数，统计窗口结束时调整并发数量"""
+
+        with self.condition:
+            self.window_bytes += size
+            elapsed = time.monotonic() - self.window_start
+
+            if elapsed < self.window:
+                return
+
+            rate = self.window_bytes / elapsed
+
+            # 吞吐量明显提升时继续增加并发，明显下降时回退，波动范围内保持不变
+            if rate > self.last_rate * 1.05:
+                self.limit = min(self.maximum, self.limit + 2)
+            elif rate < self.last_rate * 0.9:
+                self.limit = max(self.minimum, self.limit - 4)
+
+            self.last_rate = rate
+            self.window_bytes = 0
+            self.window_start = time.monotonic()
+            self.condition.notify_all()
+
+
+    def __enter__(self):
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+
+            self.active += 1
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+
+# 校验并发调整配置
+def tuner_validation(concurrency_tuner: dict | None, logger: logging.Logger) -> dict:
+    """
+    校验下载并发调整配置，缺失或无效的值使用默认值。
+    :param concurrency_tuner: 并发调整配置，配置文件中留空时为None。
+    :param logger: 日志记录器。
+    :return: 校验后的并发调整配置。
+    """
+
+    if not isinstance(concurrency_tuner, dict):
+        if concurrency_tuner is not None:
+            logger.warning("无效的并发调整配置: %s - 已自动调整为默认配置", concurrency_tuner)
+
+        concurrency_tuner = {}
+
+    tuner = {**DEFAULT_CONCURRENCY_TUNER, **concurrency_tuner}
+
+    for key, default in DEFAULT_CONCURRENCY_TUNER.items():
+        value = tuner[key]
+        # 统计窗口可为小数，并发数量必须为整数
+        valid_types = (int, float) if key == "Window" else int
+
+        if isinstance(value, bool) or not isinstance(value, valid_types) or value <= 0:
+            logger.warning("无效的并发调整配置: %s - %s - 已自动调整为%s", key, value, default)
+            tuner[key] = default
+
+    # 最低并发数量大于最高并发数量时，限流器将无法放行任何任务
+    if tuner["Minimum"] > tuner["Maximum"]:
+        logger.warning("最低并发数量 %s 大于最高并发数量 %s - 已自动调整为%s", tuner["Minimum"], tuner["Maximum"], tuner["Maximum"])
+        tuner["Minimum"] = tuner["Maximum"]
+
+    return tuner
 
 
 # 处理视频下载
-def process_video_download(logger: logging.Logger, config: dict) -> None:
+def process_video_download(logger: logging.Logger, config: dict, limiter: AdaptiveLimiter | None = None) -> str | None:
     """
-    处理视频下载
+    处理视频下载，视频保存在独立的临时目录中，交由音频处理阶段转换。
     :param config: 配置字典。
     :param logger: 日志记录器。
-    :return: None
+    :param limiter: 并发限流器，为空时不限制并发数量。
+    :return: 临时目录路径，音频已存在时返回空字符串，配置无效时返回None，使用保留的视频时在配置中标记 keep_failed
     """
 
-    required_data = {}
-    missing_data = set()
-    data_needed = ["video_name", "output_path", "download_url", "audio_format", "track_information"]
+    missing_data = PROCESS_KEYS - config.keys()
 
-    for key in data_needed:
-        if key not in config:
-            missing_data.add(key)
-            continue
+    if missing_data:
+        logger.error("配置中缺少必要的数据: %s", " - ".join(missing_data))
+        return None
 
-        required_data[key] = config[key]
+    input_file = os.path.join(config["output_path"], f"{config['video_name']}.{config['audio_format']}")
 
-    if missing_data:
-        logger.error(f"配置中缺少必要的数据: {' - '.join(missing_data)}")
-        return
+    # 未打标签的音频说明上次运行中断在音轨处理之前，无需重新下载
+    if os.path.isfile(input_file):
+        logger.info("音频文件已存在，跳过下载: %s", config["video_name"])
+        return ""
 
-    input_file = os.path.join(required_data["output_path"], f"{required_data['video_name']}.{required_data['audio_format']}")
+    temp_dir = tempfile.mkdtemp()
+    failed_path = os.path.join(config["output_path"], FAILED_DIR)
 
-    with tempfile.TemporaryDirectory() as temp_dir:
-        download_video(logger=logger, download_url=required_data["download_url"], video_name=required_data["video_name"], output_path=temp_dir)
-        download_processing(logger=logger, input_path=temp_dir, output_path=required_data["output_path"], audio_format=required_data["audio_format"])
-        audio_track_processing(logger=logger, input_file=input_file, track_information=required_data["track_information"])
+    try:
+        # 上次运行中转换失败的视频已保留在本地，直接交给转换阶段重试
+        if os.path.isdir(failed_path):
+            with os.scandir(failed_path) as entries:
+                failed_entries = [entry for entry in entries if entry.is_file() and os.path.splitext(entry.name)[0] == config["video_name"]]
+
+            if failed_entries:
+                shutil.move(failed_entries[0].path, os.path.join(temp_dir, failed_entries[0].name))
+                # 保留的视频只重试一次，多为下载不完整，再次失败时删除，下次运行重新下载
+                config["keep_failed"] = False
+                logger.info("使用上次转换失败的视频重试，跳过下载: %s", config["video_name"])
+                return temp_dir
+
+        if limiter is None:
+            download_video(logger=logger, download_url=config["download_url"], video_name=config["video_name"], output_path=temp_dir)
+        else:
+            with limiter:
+                download_video(logger=logger, download_url=config["download_url"], video_name=config["video_name"], output_path=temp_dir)
+
+            # 以下载的文件大小统计吞吐量
+            with os.scandir(temp_dir) as entries:
+                downloaded_size = sum(entry.stat().st_size for entry in entries if entry.is_file())
+
+            # 下载失败或视频已失效时没有文件，不计入吞吐量，避免误判为网络变慢
+            if downloaded_size:
+                limiter.record(downloaded_size)
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+    return temp_dir
+
+
+# 处理音频转换
+def process_audio_conversion(logger: logging.Logger, config: dict, temp_dir: str, track_frames: list | None = None) -> None:
+    """
+    将下载阶段的视频转换为音频，并处理音轨信息。
+    :param config: 配置字典。
+    :param logger: 日志记录器。
+    :param temp_dir: 下载阶段的临时目录，为空时只处理音轨信息。
+    :param track_frames: 预先构建的标签帧。
+    :return: None
+    """
+
+    input_file = os.path.join(config["output_path"], f"{config['video_name']}.{config['audio_format']}")
+
+    if temp_dir:
+        try:
+            download_processing(logger=logger, input_path=temp_dir, output_path=config["output_path"], audio_format=config["audio_format"], threads=config.get("ffmpeg_threads", DEFAULT_THREADS), keep_failed=config.get("keep_failed", True))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    audio_track_processing(logger=logger, input_file=input_file, track_information=config["track_information"], track_frames=track_frames)
 
 
 # 并发处理视频下载
@@ -57,11 +215,10 @@ def concurrent_process(logger: logging.Logger, config: dict) -> bool:
     :return: 下载是否成功
     """
 
-    data_needed = ["url_list", "name_list", "output_path", "audio_format", "track_information"]
-    missing_data = set(data_needed) - set(config.keys())
+    missing_data = CONCURRENT_KEYS - config.keys()
 
     if missing_data:
-        logger.error(f"配置中缺少必要的数据: {' - '.join(missing_data)}")
+        logger.error("配置中缺少必要的数据: %s", " - ".join(missing_data))
         return False
 
     url_list = config.get("url_list", [])
@@ -69,9 +226,11 @@ def concurrent_process(logger: logging.Logger, config: dict) -> bool:
     output_path = config.get("output_path", "")
     audio_format = config.get("audio_format", "mp3")
     track_information = config.get("track_information", {})
+    ffmpeg_threads = config.get("ffmpeg_threads", DEFAULT_THREADS)
+    concurrency_tuner = tuner_validation(concurrency_tuner=config.get("concurrency_tuner"), logger=logger)
 
     if not os.path.isdir(output_path):
-        logger.error(f"音频输出目录无效: {output_path}")
+        logger.error("音频输出目录无效: %s", output_path)
         return False
 
     if len(url_list) != len(name_list):
@@ -83,38 +242,67 @@ def concurrent_process(logger: logging.Logger, config: dict) -> bool:
         return False
 
     failed = 0
-    futures = []
-    max_workers = min(10, os.cpu_count() or 5)
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for url, video_name in zip(url_list, name_list):
-            config = {
-                "download_url": url,
-                "video_name": video_name,
-                "output_path": output_path,
-                "audio_format": audio_format,
-                "track_information": track_information,
-            }
-
-            future = executor.submit(
-                process_video_download,
-                logger=logger,
-                config=config,
-            )
-            futures.append(future)
+    futures = {}
+    processing_futures = []
+    # 所有音频共用同一张封面，只读取一次
+    cover = read_cover(audio_covers=track_information.get("Cover", ""), logger=logger)
+    # 标签帧与具体文件无关，所有音频共用同一组
+    track_frames = build_track_frames(track_information=track_information, cover_data=cover[0], covers_type=cover[1]) if cover else None
+    # 下载任务受网络延迟限制，并发数量根据吞吐量动态调整
+    limiter = AdaptiveLimiter(
+        initial=concurrency_tuner["Initial"],
+        minimum=concurrency_tuner["Minimum"],
+        maximum=concurrency_tuner["Maximum"],
+        window=concurrency_tuner["Window"],
+    )
+    max_workers = min(limiter.maximum, len(url_list))
+    # 所有任务共用的配置，循环中只补充各自的URL与名称
+    base_config = {
+        "output_path": output_path,
+        "audio_format": audio_format,
+        "ffmpeg_threads": ffmpeg_threads,
+        "track_information": track_information,
+    }
 
-        for future in concurrent.futures.as_completed(futures):
+    # 下载与转换分为两个阶段，转换时不占用下载线程
+    with ThreadPoolExecutor(max_workers=DEFAULT_PROCESSING_WORKERS) as processing_executor:
+        # 预先绑定各任务相同的参数，提交时只传入各自的配置
+        submit_conversion = functools.partial(processing_executor.submit, process_audio_conversion, logger=logger, track_frames=track_frames)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            submit_download = functools.partial(executor.submit, process_video_download, logger=logger, limiter=limiter)
+
+            for url, video_name in zip(url_list, name_list):
+                task_config = {**base_config, "download_url": url, "video_name": video_name}
+                futures[submit_download(config=task_config)] = task_config
+
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    temp_dir = future.result()
+                except Exception as error:
+                    logger.error("并发下载任务出现错误: %s", error)
+                    failed += 1
+                    continue
+
+                if temp_dir is None:
+                    failed += 1
+                    continue
+
+                # 下载完成的视频立即交给转换阶段
+                processing_futures.append(submit_conversion(temp_dir=temp_dir, config=futures[future]))
+
+        for future in concurrent.futures.as_completed(processing_futures):
             try:
                 future.result()
             except Exception as error:
-                logger.error(f"并发下载任务出现错误: {error}")
+                logger.error("并发转换任务出现错误: %s", error)
                 failed += 1
 
         return bool(failed == 0)
 
 
 # 压缩任务
-def compress_task(file: str, input_path: str, output_path: str, config: dict, logger: logging.Logger) -> bool:
+def compress_task(file: str, input_path: str, output_path: str, config: dict, logger: logging.Logger, file_id: str | None = None) -> bool:
     """
     压缩任务
     :param file: 文件名。
@@ -122,23 +310,31 @@ def compress_task(file: str, input_path: str, output_path: str, config: dict, lo
     :param output_path: 输出路径。
     :param config: 配置字典。
     :param logger: 日志记录器。
+    :param file_id: 扫描输入目录时已读取的文件标识符，避免重复解析标签。
     :return: 压缩是否成功
     """
 
-    compressor = AudioCompressor(config=config, logger=logger)
-
     try:
-        result = compressor.compress(
-            output_path=output_path,
-            input_path=os.path.join(input_path, file),
-        )
-        return result
+        # 复用当前线程的压缩器，浏览器只需启动一次
+        compressor = getattr(THREAD_LOCAL, "compressor", None)
+
+        if compressor is not None:
+            return compressor.compress(
+                output_path=output_path,
+                input_path=os.path.join(input_path, file),
+                file_id=file_id,
+            )
+
+        # 退出时关闭浏览器并清理临时目录
+        with AudioCompressor(config=config, logger=logger) as compressor:
+            return compressor.compress(
+                output_path=output_path,
+                input_path=os.path.join(input_path, file),
+                file_id=file_id,
+            )
     except Exception as error:
-        logger.error(f"压缩任务出现错误: {error}")
+        logger.error("压缩任务出现错误: %s", error)
         return False
-    finally:
-        # 确保资源释放
-        del compressor
 
 
 # 并发压缩文件
@@ -151,53 +347,74 @@ def concurrent_compression(input_path: str, output_path: str, logger: logging.Lo
     :param output_path: 输出路径。
     :return: 压缩是否成功
     """
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     if not os.path.isdir(input_path):
-        logger.error(f"音频输入目录无效: {input_path}")
+        logger.error("音频输入目录无效: %s", input_path)
         return False
 
     if not os.path.isdir(output_path):
-        logger.error(f"音频输出目录无效: {output_path}")
+        logger.error("音频输出目录无效: %s", output_path)
         return False
 
     failed = 0
     futures = []
-    # 初始化压缩器用于检查已压缩文件
-    compressor = AudioCompressor(config=config, logger=logger)
-    existing_ids = compressor.get_existing_identifiers(output_path)
-
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        for file in os.listdir(input_path):
-            input_file = os.path.join(input_path, file)
-            file_id = compressor.get_file_identifier(file_path=input_file)
-
-            if file_id in existing_ids:
-                logger.debug(f"跳过已压缩的音频: {os.path.splitext(file)[0]}")
-                continue
-
-            future = executor.submit(
-                compress_task,
-                file=file,
-                config=config,
-                logger=logger,
-                input_path=input_path,
-                output_path=output_path,
-            )
-            futures.append(future)
-
-        # 确保资源释放
-        del compressor
-        logger.info(f"视频文件处理完成 - 待压缩数量: {len(futures)} - 累计时长: {datetime.now() - start_time}")
+    compressors = []
+    existing_ids = set()
+
+    # 本地压缩受CPU限制，在线压缩受远程网站限制，配置为0时自动选择
+    max_workers = config.get("workers") or ((os.cpu_count() or 3) if config.get("ffmpeg") else 3)
+
+    # 线程启动时创建压缩器，处理该线程的所有文件
+    def init_compressor():
+        THREAD_LOCAL.compressor = AudioCompressor(config=config, logger=logger)
+        # 共用已读取的标识符，无需各线程重新扫描输出目录
+        THREAD_LOCAL.compressor.existing_identifiers[output_path] = existing_ids
+        compressors.append(THREAD_LOCAL.compressor)
+
+    with ThreadPoolExecutor(max_workers=max_workers, initializer=init_compressor) as executor:
+        # 检查已压缩文件的压缩器，退出时清理临时目录
+        with AudioCompressor(config=config, logger=logger) as compressor:
+            # 线程在首次提交任务时才启动，此前已读取输出目录的标识符
+            existing_ids.update(compressor.get_existing_identifiers(output_path))
+
+            with os.scandir(input_path) as entries:
+                audio_entries = [entry for entry in entries if entry.is_file()]
+
+            for entry in audio_entries:
+                file_id = compressor.get_cached_identifier(entry)
+
+                if file_id in existing_ids:
+                    logger.debug("跳过已压缩的音频: %s", os.path.splitext(entry.name)[0])
+                    continue
+
+                future = executor.submit(
+                    compress_task,
+                    file=entry.name,
+                    file_id=file_id,
+                    config=config,
+                    logger=logger,
+                    input_path=input_path,
+                    output_path=output_path,
+                )
+                futures.append(future)
+
+            compressor.save_identifier_index()
+
+        logger.info("视频文件处理完成 - 待压缩数量: %s - 累计时长: %.3f秒", len(futures), time.perf_counter() - start_time)
 
         for future in concurrent.futures.as_completed(futures):
             try:
                 future.result()
             except Exception as error:
-                logger.error(f"并发压缩任务出现错误: {error}")
+                logger.error("并发压缩任务出现错误: %s", error)
                 failed += 1
 
-        return bool(failed == 0)
+    # 关闭各线程的浏览器并清理临时目录
+    for compressor in compressors:
+        compressor.__exit__(None, None, None)
+
+    return bool(failed == 0)
 
 
 if __name__ == "__main__":
@@ -6,9 +6,13 @@
 # Date Modified: 2025/7/30
 # Program Name: ConfigurationFile
 
-import os, yaml, logging
+import os, time, yaml, logging
 
-from datetime import datetime
+# 优先使用 LibYAML 实现的序列化器
+try:
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
 
 # 默认配置
 DEFAULT_CONFIG = {
@@ -29,6 +33,26 @@ DEFAULT_CONFIG = {
     # 音频格式
     "Audio_Format": "mp3",
 
+    # 压缩比特率
+    "Bitrate": "128k",
+
+    # 可变比特率质量，0-9，数值越大文件越小，为空时使用固定比特率
+    "VBR_Quality": None,
+
+    # 并发压缩数量，0为自动选择
+    "Compress_Workers": 0,
+
+    # 单个 ffmpeg 进程的线程数
+    "FFmpeg_Threads": 1,
+
+    # 下载并发调整
+    "Concurrency_Tuner": {
+        "Initial": 8, # 初始并发数量
+        "Minimum": 2, # 最低并发数量
+        "Maximum": 16, # 最高并发数量
+        "Window": 5, # 吞吐量统计窗口，单位为秒
+    },
+
     # 禁用符号
     "Forbidden_Symbols": r"\/:*?\"<>|",
 
@@ -53,6 +77,9 @@ DEFAULT_CONFIG = {
         r"\[(.*?)\]",  # 英文方括号
     ],
 
+    # 信息统计格式，txt 或 jsonl
+    "Statistics_Format": "txt",
+
     # 分割线
     "Dividing_Line": {
         "filler": "-", # 分割物
@@ -62,6 +89,7 @@ DEFAULT_CONFIG = {
     # 子目录
     "Subdirectory": {
         "Log": "Log", # 日志文件
+        "Temp": "Temp", # 临时文件
         "Data": "Data", # 数据文件
         "mus_orig": os.path.join("Music", "OriginalAudio"), # 源音频文件
         "mus_comp": os.path.join("Music", "CompressedAudio"), # 压缩音频文件
@@ -116,10 +144,10 @@ def configure_initialization(output_path: str, logger: logging.Logger) -> None:
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     if not os.path.isdir(output_path):
-        logger.error(f"配置文件输出路径无效: {output_path}")
+        logger.error("配置文件输出路径无效: %s", output_path)
         return
 
     configuration_path = os.path.join(output_path, "config.yaml")
@@ -132,14 +160,14 @@ def configure_initialization(output_path: str, logger: logging.Logger) -> None:
                 stream=file, # 文件对象
                 sort_keys=False, # 禁止排序
                 data=DEFAULT_CONFIG, # 待序列化数据
-                Dumper=yaml.SafeDumper, # 安全序列化
+                Dumper=SafeDumper, # 安全序列化
                 allow_unicode=True # 允许显示非 ASCII 字符
             )
-            logger.info(f"配置文件已初始化完成: {configuration_path} - 累计时长: {datetime.now() - start_time}")
+            logger.info("配置文件已初始化完成: %s - 累计时长: %.3f秒", configuration_path, time.perf_counter() - start_time)
     except yaml.YAMLError as yaml_error:
-        logger.error(f"YAML序列化错误: {yaml_error}")
+        logger.error("YAML序列化错误: %s", yaml_error)
     except Exception as error:
-        logger.error(f"配置文件初始化失败: {error}")
+        logger.error("配置文件初始化失败: %s", error)
     pass
 
 
@@ -151,21 +179,16 @@ def read_configuration(input_path: str) -> dict:
     :return: 配置字典
     """
 
-    if not os.path.isdir(input_path):
-        return {}
-
     configuration_path = os.path.join(input_path, "config.yaml")
 
-    if not os.path.isfile(configuration_path):
-        return {}
-
+    # 直接读取，目录或文件不存在时使用默认配置
     try:
         with open(mode="r", encoding="utf-8", file=configuration_path) as file:
-            config = yaml.safe_load(file)
+            config = yaml.load(file, Loader=SafeLoader)
+    except (OSError, yaml.YAMLError):
+        return {}
 
-        return config
-    except Exception as error:
-        return error
+    return config if isinstance(config, dict) else {}
 
 
 # 函数测试
@@ -6,10 +6,10 @@
 # Date Modified: 2025/7/22
 # Program Name: ConfigureLogging
 
-import os, logging, codecs
+import os, time, queue, atexit, logging, codecs
 
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 # 全局变量
 DEFAULT_BACKUP_COUNT = 5
@@ -33,7 +33,7 @@ def terminal_log(log_level: int, log_format: logging.Formatter) -> logging.Logge
     :return: 配置好的日志记录器。
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     # 终端输出流
     terminal_handler = logging.StreamHandler()
@@ -46,7 +46,7 @@ def terminal_log(log_level: int, log_format: logging.Formatter) -> logging.Logge
     # 将日志记录器添加到终端日志记录器
     logger.addHandler(terminal_handler)
 
-    logger.debug(f"终端日志配置完成 - 累计时长: {datetime.now() - start_time}")
+    logger.debug("终端日志配置完成 - 累计时长: %.3f秒", time.perf_counter() - start_time)
     return logger
 
 
@@ -61,11 +61,11 @@ def file_log(output_path: str, log_level: int, log_format: logging.Formatter, co
     :return: 配置好的日志记录器。
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     # 检查输出目录是否存在
     if not os.path.isdir(output_path):
-        logger.error(f"父目录路径无效: {output_path}")
+        logger.error("父目录路径无效: %s", output_path)
         return None
 
     # 日志编码，默认使用全局变量
@@ -80,20 +80,20 @@ def file_log(output_path: str, log_level: int, log_format: logging.Formatter, co
     try:
         codecs.lookup(log_encoding)
     except LookupError:
-        logger.error(f"日志编码错误: {log_encoding}，现已修改为{DEFAULT_ENCODING}")
+        logger.error("日志编码错误: %s，现已修改为%s", log_encoding, DEFAULT_ENCODING)
         log_encoding = DEFAULT_ENCODING
     except Exception as error:
-        logger.error(f"日志配置错误: {error}，现已修改为{DEFAULT_ENCODING}")
+        logger.error("日志配置错误: %s，现已修改为%s", error, DEFAULT_ENCODING)
         log_encoding = DEFAULT_ENCODING
 
     # 检查日志备份数量是否有效
     if not 0 < log_backup_count < 20:
-        logger.error(f"日志备份数量错误: {log_backup_count}份，现已修改为{DEFAULT_BACKUP_COUNT}份")
+        logger.error("日志备份数量错误: %s份，现已修改为%s份", log_backup_count, DEFAULT_BACKUP_COUNT)
         log_backup_count = DEFAULT_BACKUP_COUNT
 
     # 检查日志文件大小是否有效
     if not 0 < log_max_bytes < 100*1024*1024:
-        logger.error(f"日志文件大小错误: {log_max_bytes/1024/1024}MB，现已修改为{DEFAULT_MAX_BYTES/1024/1024}MB")
+        logger.error("日志文件大小错误: %sMB，现已修改为%sMB", log_max_bytes/1024/1024, DEFAULT_MAX_BYTES/1024/1024)
         log_max_bytes = DEFAULT_MAX_BYTES
 
     # 文件输出流
@@ -109,10 +109,19 @@ def file_log(output_path: str, log_level: int, log_format: logging.Formatter, co
     # 设置文件日志格式
     file_handler.setFormatter(log_format)
 
-    # 将文件处理器添加到文件日志记录器
-    logger.addHandler(file_handler)
+    # 文件写入与轮转交由后台线程处理，工作线程只需将日志放入队列
+    log_queue = queue.Queue(-1)
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setLevel(log_level)
+    queue_listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+    queue_listener.start()
+    # 程序退出前写入队列中剩余的日志
+    atexit.register(queue_listener.stop)
 
-    logger.debug(f"文件日志配置完成 - 累计时长: {datetime.now() - start_time}")
+    # 将队列处理器添加到文件日志记录器
+    logger.addHandler(queue_handler)
+
+    logger.debug("文件日志配置完成 - 累计时长: %.3f秒", time.perf_counter() - start_time)
     return logger
 
 
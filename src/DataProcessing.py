@@ -6,46 +6,169 @@
 # Date Modified: 2025/7/26
 # Program Name: DataProcessing
 
-import os, re, time, logging, subprocess
+import os, re, time, shutil, logging, subprocess
 
-from datetime import datetime
-from mutagen.id3 import ID3, ID3NoHeaderError
+from datetime import datetime, timezone
+from IndexFile import read_index, write_index
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from mutagen.id3 import ID3, TIT3, ID3NoHeaderError
 
 # 全局变量
 DEFAULT_RETRY = 3
+DEFAULT_THREADS = 1
 DEFAULT_FORMAT = "mp3"
 DEFAULT_DURATION = "00:00:00"
 DEFAULT_PUBTIME = "0000-00-00 00:00:00"
+TITLE_INDEX = "TitleIndex.json"
+# 转换失败的视频保留在音频输出目录的此子目录中，下次运行时直接重试
+FAILED_DIR = "_failed"
+# 音频后缀与 ffmpeg 封装格式名称不一致的格式，其余格式的名称与后缀相同
+OUTPUT_MUXERS = {".m4a": "ipod", ".aac": "adts", ".mka": "matroska"}
+INVALID_CHARACTERS = str.maketrans("", "", r'\/:*?"<>|')
 MATCHING_METHOD = [
-    r"\((.*?)\)", # 英文圆括号
-    r"\[(.*?)\]", # 英文方括号
-    r"\《(.*?)\》", # 中文书名号
-    r"\【(.*?)\】", # 中文方括号
+    re.compile(r"\((.*?)\)"), # 英文圆括号
+    re.compile(r"\[(.*?)\]"), # 英文方括号
+    re.compile(r"\《(.*?)\》"), # 中文书名号
+    re.compile(r"\【(.*?)\】"), # 中文方括号
 ]
-FILTER_LABELS = [
+FILTER_LABELS = frozenset([
     "伴奏", "音质", "歌词版", "完整版", "phonk",
     "4k60帧", "4k高码率", "hi-res", "音乐推荐", "动态歌词",
     "日推歌单","无损音质", "歌词排版", "hi-res无损", "动态歌词排版"
-]
+])
+
+# 读取标题索引
+def read_title_index(index_path: str, logger: logging.Logger) -> dict:
+    """
+    读取上次运行保存的标题索引。
+    :param index_path: 标题索引文件路径。
+    :param logger: 日志记录器，用于记录处理过程中的信息。
+    :return: 文件名到 [修改时间, 原始标题] 的映射，读取失败时返回空字典。
+    """
+
+    try:
+        return read_index(index_path=index_path)
+    except Exception as error:
+        logger.warning("标题索引读取失败，将重新扫描音频目录: %s", error)
+
+    return {}
+
+
+# 保存标题索引
+def write_title_index(index_path: str, title_index: dict, logger: logging.Logger) -> None:
+    """
+    保存标题索引，先写入临时文件再替换，避免中断时损坏索引。
+    :param index_path: 标题索引文件路径。
+    :param title_index: 文件名到 [修改时间, 原始标题] 的映射。
+    :param logger: 日志记录器，用于记录处理过程中的信息。
+    :return: None
+    """
+
+    try:
+        write_index(index_path=index_path, index=title_index)
+    except Exception as error:
+        logger.warning("标题索引保存失败: %s", error)
+
+
+# 读取原始标题
+def read_title(file_path: str, logger: logging.Logger) -> str | None:
+    """
+    读取单个音频文件的原始标题，只解析TIT3标签帧。
+    :param file_path: 音频文件路径。
+    :param logger: 日志记录器，用于记录处理过程中的信息。
+    :return: 原始标题，没有标签时返回空字符串，读取失败时返回None
+    """
+
+    try:
+        # 其余标签帧保持未解析状态
+        audio_tags = ID3(file_path, known_frames={"TIT3": TIT3}).get("TIT3")
+        return str(audio_tags) if audio_tags else ""
+    except ID3NoHeaderError:
+        return ""
+    except Exception as error:
+        logger.error("音频文件标签获取失败: %s", error)
+        return None
+
+
+# 标签提取
+def tag_extraction(input_path: str, logger: logging.Logger, index_path: str = None) -> frozenset[str]:
+    """
+    单次扫描音频目录，提取已下载音频的原始标题。
+    :param input_path: 音乐文件存储路径。
+    :param logger: 日志记录器，用于记录处理过程中的信息。
+    :param index_path: 标题索引文件路径，未修改的文件直接使用索引中的标题。
+    :return: 已下载音频的原始标题集合。
+    """
+
+    title_index = {}
+    pending_entries = []
+    cached_index = read_title_index(index_path=index_path, logger=logger) if index_path else {}
+
+    with os.scandir(input_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+
+            modified_time = entry.stat().st_mtime_ns
+            cached_entry = cached_index.get(entry.name)
+
+            # 文件未修改时无需重新解析标签
+            if cached_entry and cached_entry[0] == modified_time:
+                title_index[entry.name] = cached_entry
+                continue
+
+            pending_entries.append((entry.name, entry.path, modified_time))
+
+    if pending_entries:
+        # 标签读取以文件I/O为主，线程池并行解析
+        with ThreadPoolExecutor(max_workers=min(16, len(pending_entries), (os.cpu_count() or 1) * 2)) as executor:
+            audio_titles = executor.map(lambda entry: read_title(file_path=entry[1], logger=logger), pending_entries)
+
+            for (file_name, _, modified_time), audio_title in zip(pending_entries, audio_titles):
+                if audio_title is not None:
+                    title_index[file_name] = [modified_time, audio_title]
+
+    if index_path and title_index != cached_index:
+        write_title_index(index_path=index_path, title_index=title_index, logger=logger)
+
+    return frozenset(title for _, title in title_index.values() if title)
+
+
+# 时间戳格式化
+def timestamp_formatting(timestamp: int, time_format: str, time_zone: timezone | None = None) -> str | None:
+    """
+    将时间戳格式化为字符串。
+    :param timestamp: 时间戳。
+    :param time_format: 时间格式。
+    :param time_zone: 时区，为空时使用本地时区。
+    :return: 格式化后的时间，时间戳无效时返回None
+    """
+
+    try:
+        return datetime.fromtimestamp(int(timestamp), time_zone).strftime(time_format)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+
 
 # 数据分类
-def data_classification(data: dict, input_path: str, logger: logging.Logger) -> dict:
+def data_classification(data: dict, input_path: str, logger: logging.Logger, index_path: str = None) -> dict:
     """
     处理收藏夹数据，返回数据分类字典。
     :param data: 收藏夹数据。
     :param logger: 日志记录器，用于记录处理过程中的信息。
     :param input_path: 音乐文件存储路径，用于过滤掉已下载的音频。
+    :param index_path: 标题索引文件路径，用于跳过未修改音频的标签解析。
     :return: 处理且分类后的收藏夹数据。
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     if not data:
         logger.info("收藏夹数据为空，无待下载的音频")
         return {}
 
     if not os.path.isdir(input_path):
-        logger.error(f"音频目录路径无效: {input_path}")
+        logger.error("音频目录路径无效: %s", input_path)
         return {}
 
     media_data = data.get("data", {}).get("mediaList", [])
@@ -54,8 +177,8 @@ def data_classification(data: dict, input_path: str, logger: logging.Logger) ->
         logger.info("收藏夹数据为空，无待下载的音频")
         return {}
 
-    file_tag = set()
     media_result = {}
+    queued_titles = set()
     cnt_info_fields = [
         "coin",  # 硬币
         "play",  # 播放量
@@ -66,40 +189,28 @@ def data_classification(data: dict, input_path: str, logger: logging.Logger) ->
         "thumb_up",  # 点赞数
     ]
 
-    for file in os.listdir(input_path):
-        try:
-            # 加载音频文件
-            audio_file = ID3(os.path.join(input_path, file))
-            # 获取音频标签
-            audio_tags = audio_file.getall("TIT3")[0]
-
-            if audio_tags:
-                file_tag.add(str(audio_tags))
-        except ID3NoHeaderError:
-            continue
-        except Exception as error:
-            logger.error(f"音频文件标签获取失败: {error}")
-            continue
+    file_tag = tag_extraction(input_path=input_path, logger=logger, index_path=index_path)
 
     for media in media_data:
-        media_title = ""
         bvid = media.get("bv_id", "")
-
         # 过滤标题中的无效字符
-        for character in media.get("title", "未知标题"):
-            if character in r'\/:*?"<>|':
-                continue
-
-            media_title += character
+        media_title = media.get("title", "未知标题").translate(INVALID_CHARACTERS)
 
         if not bvid:
-            logger.error(f"{media_title} 缺少bvid")
+            logger.error("%s 缺少bvid", media_title)
             continue
 
         if media_title in file_tag:
-            logger.debug(f"跳过已下载的音频: {media_title}")
+            logger.debug("跳过已下载的音频: %s", media_title)
+            continue
+
+        # 同名视频会输出到同一个音频文件，只保留第一个
+        if media_title in queued_titles:
+            logger.debug("跳过重复标题的视频: %s - %s", media_title, bvid)
             continue
 
+        queued_titles.add(media_title)
+
         cnt_info = media.get("cnt_info", {})
         media_result[bvid] = {
             "title": media_title,
@@ -108,39 +219,27 @@ def data_classification(data: dict, input_path: str, logger: logging.Logger) ->
             "cover": media.get("cover", "未知封面"),
         }
 
-        # 处理核心数据
+        # 处理核心数据，保留整数类型，写入统计文件时再格式化
         for field in cnt_info_fields:
-            media_result[bvid][field] = cnt_info.get(field, "0")
+            media_result[bvid][field] = int(cnt_info.get(field) or 0)
 
-        # 处理视频时长
-        try:
-            media_result[bvid]["duration"] = datetime.fromtimestamp(
-                media.get("duration", 0)
-            ).strftime("%H:%M:%S") # 格式化为 时:分:秒
-        except ValueError as value_error:
-            logger.error(f"{media_title} - 视频时长处理失败: 时长无效 - {value_error}")
-        except TypeError as type_error:
-            logger.error(f"{media_title} - 视频时长处理失败: 类型错误 - {type_error}")
-        except (OverflowError, OSError) as time_error:
-            logger.error(f"{media_title} - 视频时长处理失败: 超出时间范围 - {time_error}")
-        except Exception as error:
-            logger.error(f"{media_title} - 视频时长处理失败: {error}")
+        # 处理视频时长，时长不是时刻，按UTC格式化避免叠加时区偏移
+        duration = timestamp_formatting(timestamp=media.get("duration", 0), time_format="%H:%M:%S", time_zone=timezone.utc)
+
+        if duration is None:
+            logger.error("%s - 视频时长处理失败: 时长无效 - %s", media_title, media.get("duration"))
+        else:
+            media_result[bvid]["duration"] = duration
 
         # 处理发布日期
-        try:
-            media_result[bvid]["pubtime"] = datetime.fromtimestamp(
-                media.get("pubtime", 0)
-            ).strftime("%Y-%m-%d %H:%M:%S") # 格式化为 年-月-日 时:分:秒
-        except ValueError as value_error:
-            logger.error(f"{media_title} - 发布日期处理失败: 日期无效 - {value_error}")
-        except (OverflowError, OSError) as time_error:
-            logger.error(f"{media_title} - 发布日期处理失败: 日期超出范围 - {time_error}")
-        except TypeError as type_error:
-            logger.error(f"{media_title} - 发布日期处理失败: 日期类型错误 - {type_error}")
-        except Exception as error:
-            logger.error(f"{media_title} - 发布日期处理失败: {error}")
+        pubtime = timestamp_formatting(timestamp=media.get("pubtime", 0), time_format="%Y-%m-%d %H:%M:%S")
 
-    logger.info(f"视频数据处理完成 - 待下载数量: {len(media_result)} - 累计时长: {datetime.now() - start_time}")
+        if pubtime is None:
+            logger.error("%s - 发布日期处理失败: 日期无效 - %s", media_title, media.get("pubtime"))
+        else:
+            media_result[bvid]["pubtime"] = pubtime
+
+    logger.info("视频数据处理完成 - 待下载数量: %s - 累计时长: %.3f秒", len(media_result), time.perf_counter() - start_time)
     return media_result
 
 
@@ -155,11 +254,11 @@ def name_extraction(input_path: str, logger: logging.Logger, filter_labels: list
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
     failed, succeed, invalidity = 0, 0, 0
 
     if not os.path.exists(input_path):
-        logger.error(f"音频目录路径无效: {input_path}")
+        logger.error("音频目录路径无效: %s", input_path)
         return
 
     if not matching_method:
@@ -168,53 +267,149 @@ def name_extraction(input_path: str, logger: logging.Logger, filter_labels: list
     if not filter_labels:
         filter_labels = FILTER_LABELS
 
-    for file in os.listdir(input_path):
-        matches = []
-        process_file = file.strip().lower()
+    # 文件名统一转为小写匹配，标签同样只需转换一次
+    filter_labels = frozenset(label.lower() for label in filter_labels)
+    matching_method = [re.compile(method) for method in matching_method]
 
-        for method in matching_method:
-            for match in re.findall(method, process_file):
-                if not match or match in filter_labels:
-                    continue
+    # 先取得目录快照，重命名时不会影响遍历
+    with os.scandir(input_path) as entries:
+        audio_entries = [entry for entry in entries if entry.is_file()]
 
-                matches.append(match)
+    for entry in audio_entries:
+        file = entry.name
+        process_file = file.strip().lower()
+        # 逐个方法匹配，括号嵌套时内外两层都能提取，没有分组时使用整个匹配，多个分组时使用第一个分组
+        found = (match[1 if method.groups else 0] for method in matching_method for match in method.finditer(process_file))
+        matches = [match for match in found if match and match not in filter_labels]
 
         if not matches:
-            logger.debug(f"未找到有效匹配: {file}")
+            logger.debug("未找到有效匹配: %s", file)
             invalidity += 1
             continue
 
         file_name = " - ".join(matches) + os.path.splitext(file)[1]
 
+        # 上次运行已重命名的文件无需再次处理
+        if file_name == file:
+            logger.debug("文件名称无需修改: %s", file)
+            continue
+
         # 原始音频文件的路径
-        orig_path = os.path.join(input_path, file)
+        orig_path = entry.path
         # 重命名后的文件路径
         rename_file = os.path.join(input_path, file_name)
 
         # 重命名文件
         try:
             os.rename(orig_path, rename_file)
-            logger.info(f"文件重命名成功: {file} -> {os.path.basename(rename_file)}")
+            logger.info("文件重命名成功: %s -> %s", file, os.path.basename(rename_file))
             succeed += 1
             continue
         except FileNotFoundError as found_error:
-            logger.error(f"文件重命名失败: 源文件不存在 {found_error}")
+            logger.error("文件重命名失败: 源文件不存在 %s", found_error)
         except FileExistsError as exist_error:
-            logger.error(f"文件重命名失败: 目标文件已存在 {exist_error}")
+            logger.error("文件重命名失败: 目标文件已存在 %s", exist_error)
         except Exception as error:
-            logger.error(f"文件重命名失败: {error}")
+            logger.error("文件重命名失败: %s", error)
 
         failed += 1
 
-    logger.info(f"文件重命名完成 - 成功: {succeed} - 失败: {failed} - 无效: {invalidity} - 累计时长: {datetime.now() - start_time}")
+    logger.info("文件重命名完成 - 成功: %s - 失败: %s - 无效: %s - 累计时长: %.3f秒", succeed, failed, invalidity, time.perf_counter() - start_time)
     pass
 
 
+# 文件转换
+def file_conversion(input_file: str, output_file: str, logger: logging.Logger, retry: int = DEFAULT_RETRY, threads: int = DEFAULT_THREADS, failed_path: str | None = None) -> bool:
+    """
+    通过 ffmpeg 命令行工具将单个视频文件转换为音频文件。
+    :param retry: 重试次数。
+    :param threads: 单个 ffmpeg 进程的线程数。
+    :param failed_path: 转换失败的视频保留目录，为空时直接删除视频。
+    :param input_file: 视频文件路径。
+    :param output_file: 音频文件路径。
+    :param logger: 日志记录器，用于记录处理过程中的信息。
+    :return: 转换是否成功。
+    """
+
+    start_time = time.perf_counter()
+    file = os.path.basename(input_file)
+    # 先输出到临时文件，避免中断时残留的不完整音频被误认为已转换
+    temp_file = output_file + ".part"
+    output_format = os.path.splitext(output_file)[1].lower()
+
+    # 输入已是目标格式的音频流时直接复制，无需重新编码
+    if os.path.splitext(input_file)[1].lower() == output_format:
+        audio_options = ["-c:a", "copy"]
+    else:
+        audio_options = ["-ac", "2"]  # 音频双声通道
+
+    ffmpeg_command = [
+        "ffmpeg",
+        "-y",  # 覆盖存在文件
+        "-nostats",  # 禁用进度信息
+        "-loglevel", "error",  # 只输出错误信息
+        "-i", input_file,  # 文件输入路径
+        "-vn",  # 只提取音频流
+        *audio_options,  # 音频编码选项
+        "-threads", str(threads),  # 限制线程数，避免并发转换时抢占CPU
+        "-f", OUTPUT_MUXERS.get(output_format, output_format.lstrip(".")),  # 临时文件的后缀无法决定格式，需显式指定
+        temp_file,  # 临时文件路径
+    ]
+
+    # 重试机制
+    for count in range(1, retry + 1):
+        command_result = subprocess.run(
+            ffmpeg_command, # 命令列表
+            encoding="utf-8",  # 编码格式
+            text=True, # 以文本模式返回输出的结果
+            errors="replace", # 替换解码错误时无效字符
+            stdout=subprocess.DEVNULL, # 丢弃进度输出
+            stderr=subprocess.PIPE, # 只捕获错误信息
+        )
+
+        if command_result.returncode == 0:
+            # 转换完成后再替换为最终文件名
+            os.replace(temp_file, output_file)
+            logger.info("视频转换音频成功: %s - 累计时长: %.3f秒", file, time.perf_counter() - start_time)
+            os.remove(input_file)
+            return True
+
+        logger.error("视频转换音频失败: %s - %s", file, command_result.stderr[-2000:].strip())
+
+        # 最后一次失败后无需等待
+        if count == retry:
+            break
+
+        logger.debug("等待1秒后视频 %s 启动第 %s 次转换重试", file, count)
+        time.sleep(1)
+
+    logger.error("视频 %s 转换音频重试过多，本次处理已跳过", file)
+
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+
+    if failed_path is None:
+        os.remove(input_file)
+        return False
+
+    # 保留视频，下次运行时无需重新下载
+    try:
+        os.makedirs(failed_path, exist_ok=True)
+        shutil.move(input_file, os.path.join(failed_path, file))
+        logger.info("转换失败的视频已保留: %s", os.path.join(failed_path, file))
+    except Exception as error:
+        logger.error("转换失败的视频保留失败: %s - %s", file, error)
+
+    return False
+
+
 # 下载处理
-def download_processing(input_path: str, output_path: str, logger: logging.Logger, retry: int = DEFAULT_RETRY, audio_format: str = DEFAULT_FORMAT) -> None:
+def download_processing(input_path: str, output_path: str, logger: logging.Logger, retry: int = DEFAULT_RETRY, audio_format: str = DEFAULT_FORMAT, threads: int = DEFAULT_THREADS, keep_failed: bool = True) -> None:
     """
     通过 ffmpeg 命令行工具将视频文件转换为音频文件。
     :param retry: 重试次数。
+    :param threads: 单个 ffmpeg 进程的线程数。
+    :param keep_failed: 转换失败时是否保留视频，为False时直接删除，下次运行重新下载。
     :param audio_format: 音频格式。
     :param input_path: 视频输入路径。
     :param output_path: 音频输出路径。
@@ -222,7 +417,8 @@ def download_processing(input_path: str, output_path: str, logger: logging.Logge
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
+    failed, succeed = 0, 0
 
     # 音频小写格式化
     audio_format = audio_format.lower()
@@ -230,53 +426,59 @@ def download_processing(input_path: str, output_path: str, logger: logging.Logge
     audio_format = f".{audio_format.lstrip('.')}"
 
     if not os.path.isdir(input_path):
-        logger.error(f"输入目录路径无效: {input_path}")
+        logger.error("输入目录路径无效: %s", input_path)
         return
 
     if not os.path.isdir(output_path):
-        logger.error(f"输出目录路径无效: {output_path}")
+        logger.error("输出目录路径无效: %s", output_path)
         return
 
     if not 1 <= retry <= 5:
-        logger.error(f"无效的重试次数: {retry} - 最低为1，最高为5 - 已自动调整为{DEFAULT_RETRY}")
+        logger.error("无效的重试次数: %s - 最低为1，最高为5 - 已自动调整为%s", retry, DEFAULT_RETRY)
         retry = DEFAULT_RETRY
 
-    for file in os.listdir(input_path):
-        # 拼接文件路径
-        input_file = os.path.join(input_path, file)
-        output_file = os.path.join(output_path, os.path.splitext(file)[0] + audio_format)
-
-        ffmpeg_command = [
-            "ffmpeg",
-            "-y",  # 覆盖存在文件
-            "-vn",  # 只提取音频流
-            "-nostats",  # 禁用进度信息
-            "-ac", "2",  # 音频双声通道
-            output_file,  # 文件输出路径
-            "-i", input_file,  # 文件输入路径
-            "-f", audio_format,  # 文件输出格式
-        ]
-
-        # 重试机制
-        for count in range(1, retry + 1):
-            command_result = subprocess.run(
-                ffmpeg_command, # 命令列表
-                encoding="utf-8",  # 编码格式
-                text=True, # 以文本模式返回输出的结果
-                errors="replace", # 替换解码错误时无效字符
-                capture_output=True # 捕获标准输出和标准错误
+    tasks = []
+    futures = []
+    failed_path = os.path.join(output_path, FAILED_DIR) if keep_failed else None
+
+    with os.scandir(input_path) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+
+            # 拼接文件路径
+            output_file = os.path.join(output_path, os.path.splitext(entry.name)[0] + audio_format)
+            tasks.append((entry.path, output_file))
+
+    if not tasks:
+        logger.error("输入目录中没有待转换的视频: %s", input_path)
+        return
+
+    # ffmpeg 运行在子进程中，线程池即可并行转换
+    with ThreadPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as executor:
+        for input_file, output_file in tasks:
+            future = executor.submit(
+                file_conversion,
+                retry=retry,
+                logger=logger,
+                threads=threads,
+                input_file=input_file,
+                failed_path=failed_path,
+                output_file=output_file,
             )
+            futures.append(future)
 
-            if command_result.returncode == 0:
-                logger.info(f"视频转换音频成功: {file} - 累计时长: {datetime.now() - start_time}")
-                os.remove(input_file)
-                return
+        for future in as_completed(futures):
+            try:
+                if future.result():
+                    succeed += 1
+                    continue
+            except Exception as error:
+                logger.error("视频转换任务出现错误: %s", error)
 
-            logger.error(f"视频转换音频失败，等待1秒后启动第 {count} 次重试")
-            time.sleep(1)
+            failed += 1
 
-        logger.error(f"视频 {file} 转换音频重试过多，本次处理已跳过")
-        os.remove(input_file)
+    logger.info("视频转换完成 - 成功: %s - 失败: %s - 累计时长: %.3f秒", succeed, failed, time.perf_counter() - start_time)
     pass
 
 
@@ -6,19 +6,151 @@
 # Date Modified: 2025/7/30
 # Program Name: FileCompression
 
-import os, time, shutil, logging, tempfile
-
-from datetime import datetime
-from selenium import webdriver
-from fake_useragent import UserAgent
-from selenium.webdriver.support import ui
-from selenium.webdriver.common.by import By
-from mutagen.id3 import ID3, ID3NoHeaderError
-from selenium.webdriver.edge import options, service
+import os, time, errno, random, shutil, logging, tempfile, threading, subprocess
+
+from concurrent.futures import ThreadPoolExecutor
+from NetworkOperations import USER_AGENTS
+from IndexFile import read_index, write_index
+from mutagen.id3 import ID3, TIT3, ID3NoHeaderError
 from selenium.common import TimeoutException, NoSuchElementException
 
+# 优先通过文件系统事件等待下载，未安装 watchdog 时轮询临时目录
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# 全局变量
+# 在页面中监听DOM变化，所有元素出现后一次返回，无需驱动轮询
+WAIT_SCRIPT = """
+const [conditions, callback] = [arguments[0], arguments[arguments.length - 1]];
+const ready = () => {
+    const elements = conditions.map(([selector, clickable]) => {
+        const element = document.querySelector(selector);
+        return element && (!clickable || (element.offsetParent !== null && !element.disabled)) ? element : null;
+    });
+    return elements.every(Boolean) ? elements : null;
+};
+const elements = ready();
+if (elements) {
+    callback(elements);
+} else {
+    const observer = new MutationObserver(() => {
+        const elements = ready();
+        if (elements) {
+            observer.disconnect();
+            callback(elements);
+        }
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true});
+}
+"""
+DEFAULT_THREADS = 1
+DEFAULT_BITRATE = "128k"
+# 浏览器复用次数上限，达到后重启以限制内存增长
+DEFAULT_MAX_USES = 50
+IDENTIFIER_INDEX = "IdentifierIndex.json"
+# 重试的指数退避等待时间，上限30秒
+BACKOFF_TIMES = (5, 25, 30)
+DEFAULT_TIMEOUT = {
+    "load_time": 5,
+    "compress_time": 20,
+    "completion_time": 100,
+}
+DEFAULT_DOWNLOAD_CONFIGURATION = {
+    "safebrowsing.enabled": False, # 禁用安全浏览
+    "useAutomationExtension": False, # 禁用自动化扩展
+    "download.prompt_for_download": False, # 禁用下载提示
+    "download.directory_upgrade": True, # 允许下载到指定目录
+    "credentials_enable_service": False,  # 禁用密码保存提示
+    "profile.default_content_settings.popups": 0, # 禁用弹窗
+    "profile.password_manager_enabled": False,  # 禁用密码管理器
+    "profile.managed_default_content_settings.media_stream": 2, # 禁用媒体流
+    "profile.managed_default_content_settings.geolocation": 2, # 禁用地理位置
+    "profile.managed_default_content_settings.media_stream_mic": 2, # 禁用麦克风
+    "profile.managed_default_content_settings.media_stream_camera": 2, # 禁用摄像头
+}
+
+
+# 移动文件
+def move_file(source: str, destination: str) -> None:
+    """
+    移动文件，同一文件系统内直接重命名，跨文件系统时复制后删除源文件。
+    :param source: 源文件路径。
+    :param destination: 目标文件路径，已存在时覆盖。
+    :return: None
+    """
+
+    try:
+        os.replace(source, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+
+        shutil.copy2(source, destination)
+        os.remove(source)
+
+
+class DownloadWatcher:
+    def __init__(self):
+        """监听临时下载目录，记录下载开始与完成的事件"""
+
+        self.started = threading.Event()
+        self.finished = threading.Event()
+
+
+    def reset(self):
+        """清除上一个文件的下载状态"""
+
+        self.started.clear()
+        self.finished.clear()
+
+
+    def dispatch(self, event):
+        """处理文件系统事件，由 watchdog 的观察线程调用"""
+
+        if event.is_directory:
+            return
+
+        # 浏览器会同时创建 .crdownload 与同名的占位文件
+        if event.event_type == "created":
+            self.started.set()
+        elif event.event_type == "moved" and not event.dest_path.endswith(".crdownload"):
+            # .crdownload 重命名为最终文件名即下载完成
+            self.started.set()
+            self.finished.set()
+
 
 class AudioCompressor:
+    # 固定的浏览器参数，与实例无关
+    EDGE_ARGUMENTS = (
+        "--no-sandbox", # 禁用沙盒模式
+        "--disable-gpu", # 禁用GPU加速
+        "--disable-sync", # 禁用同步功能
+        "--headless=new", # 启用无头模式
+        "--disable-d3d11", # 禁用Direct3D
+        "--disable-logging", # 禁用日志记录
+        "--disable-3d-apis", # 禁用3D图形
+        "--disable-plugins", # 禁用所有插件
+        "--disable-breakpad", # 禁用崩溃报告
+        "--disable-canvas-aa", # 禁用抗锯齿
+        "--disable-extensions", # 禁用所有扩展
+        "--enable-fast-unload", # 启用快速加载页面
+        "--disable-notifications", # 禁用所有通知
+        "--disable-component-update", # 禁止组件自动更新
+        "--disable-software-rasterizer", # 禁用备用呈现器
+        "--enable-parallel-downloading", # 启用并行下载
+        "--disable-background-networking", # 禁用后台网络
+        "--enable-features=NetworkService", # 启用网络服务
+        "--disable-offer-upload-credit-cards", # 禁用信用卡填充
+        "--blink-settings=imagesEnabled=false", # 禁用图像加载
+        "--disable-background-timer-throttling", # 禁用后台计时器
+        "--disable-blink-features=AutomationControlled", # 隐藏自动化控制特征
+        # 禁用渲染器检查与媒体数据预加载，同一参数重复出现时只有最后一个生效
+        "--disable-features=RendererCodeIntegrity,msEdgePreloadMediaEngagementData",
+    )
+
+
     def __init__(self, config: dict, logger: logging.Logger):
         """
         初始化音频压缩器
@@ -26,41 +158,39 @@ class AudioCompressor:
         :param logger: 日志记录器
         """
 
+        self.uses = 0
         self.browser = None
         self.config = config
         self.logger = logger
         self.file_name = None
+        self.download_link = None
+        self.ffmpeg = config.get("ffmpeg")
         self.retry = config.get("retry", 3)
-        self.temp_dir = tempfile.TemporaryDirectory()
-        self.timeout = config.get("Timeout_Period", {
-            "load_time": 5,
-            "compress_time": 20,
-            "completion_time": 100,
-        })
-        self.download_configuration = {
-            "safebrowsing.enabled": False, # 禁用安全浏览
-            "useAutomationExtension": False, # 禁用自动化扩展
-            "download.prompt_for_download": False, # 禁用下载提示
-            "download.directory_upgrade": True, # 允许下载到指定目录
-            "credentials_enable_service": False,  # 禁用密码保存提示
-            "profile.default_content_settings.popups": 0, # 禁用弹窗
-            "profile.password_manager_enabled": False,  # 禁用密码管理器
-            "profile.managed_default_content_settings.media_stream": 2, # 禁用媒体流
-            "profile.managed_default_content_settings.geolocation": 2, # 禁用地理位置
-            "profile.managed_default_content_settings.media_stream_mic": 2, # 禁用麦克风
-            "profile.managed_default_content_settings.media_stream_camera": 2, # 禁用摄像头
-        }
-        self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0"
-
-        # 合并超时配置
-        self.timeouts = {
-            key: config.get(key, self.timeout.get(key, value))
-            for key, value in self.timeout.items()
-        }
+        self.max_uses = config.get("max_uses", DEFAULT_MAX_USES)
+        self.bitrate = config.get("bitrate", DEFAULT_BITRATE)
+        self.vbr_quality = config.get("vbr_quality")
+        self.threads = config.get("threads", DEFAULT_THREADS)
+        # 下载目录可指定到输出目录所在的磁盘或内存盘，为空时使用系统临时目录
+        self.temp_dir = tempfile.TemporaryDirectory(dir=config.get("temp_root"))
+        # 浏览器配置目录，浏览器重启后仍可复用页面缓存
+        self.profile_dir = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+        self.watcher = None
+        self.observer = None
+        # 文件标识符索引，首次使用时读取
+        self.index_path = config.get("index_path")
+        self.cached_index = None
+        self.identifier_index = {}
+        # 各输出目录中已压缩文件的标识符，首次压缩到该目录时读取
+        self.existing_identifiers = {}
+        # 合并超时配置，单独设置的超时时间优先
+        self.base_timeouts = {**DEFAULT_TIMEOUT, **config.get("Timeout_Period", {})}
+        self.base_timeouts.update((key, config[key]) for key in DEFAULT_TIMEOUT if key in config)
+        # 当前文件使用的超时时间，重试时加倍，压缩下一个文件时恢复
+        self.timeouts = dict(self.base_timeouts)
 
         # 合并下载配置
         self.download_config = {
-            **self.download_configuration,
+            **DEFAULT_DOWNLOAD_CONFIGURATION,
             **config.get("download_configuration", {})
         }
 
@@ -68,74 +198,39 @@ class AudioCompressor:
     def init_browser(self):
         """初始化并返回浏览器实例"""
 
-        # 随机生成UserAgent
-        user_agent = UserAgent(
-            fallback=self.user_agent, # 备用UserAgent
-            min_percentage=0.1, # 过滤使用率小于10%的浏览器版本
-        )
+        # 只有在线压缩需要浏览器，使用本地 ffmpeg 时无需加载 webdriver
+        from selenium import webdriver
+        from selenium.webdriver.edge import options, service
 
         # 浏览器选项配置
         edge_options = options.Options()
 
-        # 启用无痕模式
-        edge_options.add_argument("--incognito")
-        # 禁用沙盒模式
-        edge_options.add_argument("--no-sandbox")
-        # 禁用GPU加速
-        edge_options.add_argument("--disable-gpu")
-        # 禁用同步功能
-        edge_options.add_argument("--disable-sync")
-        # 启用无头模式
-        edge_options.add_argument("--headless=new")
-        # 禁用Direct3D
-        edge_options.add_argument("--disable-d3d11")
-        # 禁用日志记录
-        edge_options.add_argument("--disable-logging")
-        # 禁用3D图形
-        edge_options.add_argument("--disable-3d-apis")
-        # 禁用所有插件
-        edge_options.add_argument("--disable-plugins")
-        # 禁用崩溃报告
-        edge_options.add_argument("--disable-breakpad")
-        # 禁用抗锯齿
-        edge_options.add_argument("--disable-canvas-aa")
-        # 禁用所有扩展
-        edge_options.add_argument("--disable-extensions")
-        # 启用快速加载页面
-        edge_options.add_argument("--enable-fast-unload")
-        # 禁用所有通知
-        edge_options.add_argument("--disable-notifications")
-        # 禁止组件自动更新
-        edge_options.add_argument("--disable-component-update")
-        # 禁用备用呈现器
-        edge_options.add_argument("--disable-software-rasterizer")
-        # 启用并行下载
-        edge_options.add_argument("--enable-parallel-downloading")
+        # 设置配置目录
+        edge_options.add_argument(f"--user-data-dir={self.profile_dir.name}")
+        # 设置缓存目录
+        edge_options.add_argument(f"--disk-cache-dir={os.path.join(self.profile_dir.name, 'Cache')}")
+        # 添加固定的浏览器参数
+        for argument in self.EDGE_ARGUMENTS:
+            edge_options.add_argument(argument)
+
         # 设置用户代理
-        edge_options.add_argument(f"user-agent={user_agent.random}")
-        # 禁用后台网络
-        edge_options.add_argument("--disable-background-networking")
-        # 启用网络服务
-        edge_options.add_argument("--enable-features=NetworkService")
-        # 启用网络服务
-        edge_options.add_argument("--enable-features=NetworkService")
-        # 禁用信用卡填充
-        edge_options.add_argument("--disable-offer-upload-credit-cards")
-        # 禁用图像加载
-        edge_options.add_argument("--blink-settings=imagesEnabled=false")
-        # 禁用后台计时器
-        edge_options.add_argument("--disable-background-timer-throttling")
-        # 禁用渲染器检查
-        edge_options.add_argument("--disable-features=RendererCodeIntegrity")
-        # 隐藏自动化控制特征
-        edge_options.add_argument("--disable-blink-features=AutomationControlled")
-        # 禁用媒体数据预加载
-        edge_options.add_argument("--disable-features=msEdgePreloadMediaEngagementData")
+        edge_options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
 
         # 设置下载目录
         self.download_config["download.default_directory"] = self.temp_dir.name
         edge_options.add_experimental_option("prefs", self.download_config)
 
+        # 页面可交互后即返回，不等待图片等子资源
+        edge_options.page_load_strategy = "eager"
+
+        # 只有浏览器下载需要监听下载目录，首次启动浏览器时开始监听
+        if Observer is not None and self.observer is None:
+            self.watcher = DownloadWatcher()
+            self.observer = Observer()
+            self.observer.schedule(self.watcher, self.temp_dir.name)
+            self.observer.daemon = True
+            self.observer.start()
+
         # 创建浏览器实例
         driver_service = service.Service(self.config.get("edge_driver"))
         self.browser = webdriver.Edge(options=edge_options, service=driver_service)
@@ -147,14 +242,60 @@ class AudioCompressor:
         """获取文件唯一标识符（优先使用ID3标签，失败则使用文件大小）"""
 
         try:
-            audio = ID3(file_path)
-            return str(audio.getall("TIT3")[0])
+            # 只解析TIT3标签帧，跳过封面等其余标签帧
+            audio_tags = ID3(file_path, known_frames={"TIT3": TIT3}).get("TIT3")
+
+            if audio_tags:
+                return str(audio_tags)
         except ID3NoHeaderError:
-            self.logger.warning(f"文件缺少ID3标签头: {self.file_name}")
-            return str(os.path.getsize(file_path))
+            self.logger.warning("文件缺少ID3标签头: %s", os.path.basename(file_path))
         except Exception as error:
-            self.logger.error(f"获取文件标识符失败: {self.file_name} - {error}")
-            return str(os.path.getsize(file_path))
+            self.logger.error("获取文件标识符失败: %s - %s", os.path.basename(file_path), error)
+
+        return str(os.path.getsize(file_path))
+
+
+    def get_cached_identifier(self, entry: os.DirEntry):
+        """获取文件标识符，文件未修改时直接使用索引中的标识符"""
+
+        self.load_identifier_index()
+        modified_time = entry.stat().st_mtime_ns
+        cached_entry = self.cached_index.get(entry.path)
+
+        if cached_entry and cached_entry[0] == modified_time:
+            identifier = cached_entry[1]
+        else:
+            identifier = self.get_file_identifier(entry.path)
+
+        self.identifier_index[entry.path] = [modified_time, identifier]
+        return identifier
+
+
+    def load_identifier_index(self):
+        """读取上次运行保存的文件标识符索引"""
+
+        if self.cached_index is not None:
+            return
+
+        self.cached_index = {}
+
+        if self.index_path:
+            try:
+                self.cached_index = read_index(index_path=self.index_path)
+            except Exception as error:
+                self.logger.warning("文件标识符索引读取失败，将重新读取文件标签: %s", error)
+
+
+    def save_identifier_index(self):
+        """保存本次使用的文件标识符，已删除的文件不再保留"""
+
+        if not self.index_path or self.identifier_index == self.cached_index:
+            return
+
+        try:
+            write_index(index_path=self.index_path, index=self.identifier_index)
+        except Exception as error:
+            self.logger.warning("文件标识符索引保存失败: %s", error)
 
 
     def get_existing_identifiers(self, output_dir: str):
@@ -162,36 +303,113 @@ class AudioCompressor:
 
         identifiers = set()
 
-        for file in os.listdir(output_dir):
-            try:
-                file_path = os.path.join(output_dir, file)
-                identifiers.add(self.get_file_identifier(file_path))
-            except Exception as error:
-                self.logger.error(f"文件标识符获取失败: {file} - {error}")
+        with os.scandir(output_dir) as entries:
+            file_entries = [entry for entry in entries if entry.is_file()]
+
+        if not file_entries:
+            return identifiers
+
+        # 在线程池启动前读取索引，避免多个线程重复读取
+        self.load_identifier_index()
+
+        # 标识符读取以文件I/O为主，线程池并行解析
+        with ThreadPoolExecutor(max_workers=min(16, len(file_entries), (os.cpu_count() or 1) * 2)) as executor:
+            futures = [executor.submit(self.get_cached_identifier, entry) for entry in file_entries]
+
+            for entry, future in zip(file_entries, futures):
+                try:
+                    identifiers.add(future.result())
+                except Exception as error:
+                    self.logger.error("文件标识符获取失败: %s - %s", entry.name, error)
 
         return identifiers
 
 
+    def clear_temp_dir(self):
+        """清空临时下载目录，避免上一个文件的下载残留被误认为本次结果"""
+
+        with os.scandir(self.temp_dir.name) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        shutil.rmtree(entry.path)
+                    else:
+                        os.remove(entry.path)
+                except Exception as error:
+                    self.logger.debug("临时文件删除失败: %s - %s", entry.name, type(error).__name__)
+
+
+    def downloading(self) -> bool:
+        """检查临时目录中是否存在未完成的下载，找到即返回"""
+
+        with os.scandir(self.temp_dir.name) as entries:
+            return any(entry.name.endswith(".crdownload") for entry in entries)
+
+
+    def close(self):
+        """关闭浏览器实例"""
+
+        if not self.browser:
+            return
+
+        try:
+            self.browser.quit()
+        except Exception as error:
+            self.logger.debug("浏览器关闭失败: %s", type(error).__name__)
+
+        self.uses = 0
+        self.browser = None
+
+
+    def release_browser(self):
+        """压缩完成后释放页面，复用次数达到上限时关闭浏览器"""
+
+        self.uses += 1
+
+        if self.uses >= self.max_uses:
+            self.logger.debug("浏览器复用次数达到上限，关闭后重新启动: %s", self.uses)
+            self.close()
+            return
+
+        try:
+            # 离开压缩页面，释放页面占用的内存与脚本
+            self.browser.get("about:blank")
+        except Exception as error:
+            self.logger.debug("浏览器页面释放失败: %s", type(error).__name__)
+            self.close()
+
+
+    def wait_elements(self, conditions: list, timeout: float) -> list:
+        """等待页面中出现所有指定元素，条件为 [选择器, 是否需要可点击]，超时时抛出 TimeoutException"""
+
+        self.browser.set_script_timeout(timeout)
+        return self.browser.execute_async_script(WAIT_SCRIPT, conditions)
+
+
+    def wait_element(self, selector: str, timeout: float, clickable: bool = False):
+        """等待页面中出现指定元素，超时时抛出 TimeoutException"""
+
+        return self.wait_elements([[selector, clickable]], timeout)[0]
+
+
     def upload_file(self, file_path: str):
         """将文件上传到压缩网站"""
 
         try:
             # 等待上传按钮加载
-            upfile_button = ui.WebDriverWait(
-                self.browser, self.timeouts.get("load_time")
-            ).until(lambda d: d.find_element(By.NAME, "upfile"))
+            upfile_button = self.wait_element("input[name='upfile']", self.timeouts.get("load_time"))
 
             # 上传文件
             upfile_button.send_keys(file_path)
-            self.logger.debug(f"文件上传成功: {self.file_name}")
+            self.logger.debug("文件上传成功: %s", self.file_name)
 
             return True
         except NoSuchElementException:
-            self.logger.error(f"文件上传失败: 未找到文件上传元素 - {self.file_name}")
+            self.logger.error("文件上传失败: 未找到文件上传元素 - %s", self.file_name)
         except TimeoutException:
-            self.logger.error(f"文件上传失败: 文件上传元素加载超时 - {self.file_name}")
+            self.logger.error("文件上传失败: 文件上传元素加载超时 - %s", self.file_name)
         except Exception as error:
-            self.logger.error(f"文件上传失败: {self.file_name} - {error}")
+            self.logger.error("文件上传失败: %s - %s", self.file_name, error)
 
         return False
 
@@ -201,26 +419,25 @@ class AudioCompressor:
 
         try:
             # 等待提交按钮加载
-            submit_button = ui.WebDriverWait(
-                self.browser, self.timeouts.get("load_time")
-            ).until(lambda d: d.find_element(By.ID, "submitbutton"))
+            submit_button = self.wait_element("#submitbutton", self.timeouts.get("load_time"), clickable=True)
 
             # 提交文件
             submit_button.click()
 
             # 等待压缩完成提示
-            ui.WebDriverWait(
-                self.browser, self.timeouts.get("compress_time")
-            ).until(lambda d: d.find_element(By.CLASS_NAME, "result-message"))
+            # 下载链接与压缩完成提示同时出现，一次等待即可取得
+            _, self.download_link = self.wait_elements(
+                [[".result-message", False], ["a[href*='download.php']", True]], self.timeouts.get("compress_time")
+            )
 
-            self.logger.debug(f"文件压缩完成: {self.file_name}")
+            self.logger.debug("文件压缩完成: %s", self.file_name)
             return True
         except TimeoutException:
-            self.logger.error(f"启动压缩失败: 压缩过程超时 - {self.file_name}")
+            self.logger.error("启动压缩失败: 压缩过程超时 - %s", self.file_name)
         except NoSuchElementException:
-            self.logger.error(f"启动压缩失败: 文件压缩元素加载超时 - {self.file_name}")
+            self.logger.error("启动压缩失败: 文件压缩元素加载超时 - %s", self.file_name)
         except Exception as error:
-            self.logger.error(f"启动压缩失败: {self.file_name} - {error}")
+            self.logger.error("启动压缩失败: %s - %s", self.file_name, error)
         return False
 
 
@@ -229,82 +446,168 @@ class AudioCompressor:
 
         try:
             # 查找下载链接
-            download_link = ui.WebDriverWait(
-                self.browser, self.timeouts.get("load_time")
-            ).until(lambda d: d.find_element(By.XPATH, "//a[contains(@href, \"download.php\")]"))
+            download_link = self.download_link or self.wait_element("a[href*='download.php']", self.timeouts.get("load_time"), clickable=True)
 
             if download_link:
+                if self.watcher is not None:
+                    self.watcher.reset()
+
                 # 下载文件
                 download_link.click()
 
-                # 等待下载开始
-                ui.WebDriverWait(
-                    self.browser, self.timeouts.get("compress_time")
-                ).until(lambda _: any(file.endswith(".crdownload") for file in os.listdir(self.temp_dir.name)))
+                if self.watcher is not None:
+                    # 等待文件系统事件，无需轮询临时目录
+                    if not self.watcher.started.wait(self.timeouts.get("compress_time")):
+                        raise TimeoutException("下载未开始")
 
-                # 等待下载完成
-                ui.WebDriverWait(
-                    self.browser, self.timeouts.get("completion_time")
-                ).until(lambda _: not any(file.endswith(".crdownload") for file in os.listdir(self.temp_dir.name)))
+                    if not self.watcher.finished.wait(self.timeouts.get("completion_time")) or self.downloading():
+                        raise TimeoutException("下载未完成")
+                else:
+                    from selenium.webdriver.support import ui
+
+                    # 等待下载开始
+                    ui.WebDriverWait(
+                        self.browser, self.timeouts.get("compress_time")
+                    ).until(lambda _: self.downloading())
+
+                    # 等待下载完成
+                    ui.WebDriverWait(
+                        self.browser, self.timeouts.get("completion_time")
+                    ).until(lambda _: not self.downloading())
 
                 # 查找下载的文件
-                downloaded_files = [file for file in os.listdir(self.temp_dir.name) if not file.endswith('.crdownload')]
+                with os.scandir(self.temp_dir.name) as entries:
+                    downloaded_files = [entry for entry in entries if entry.is_file() and not entry.name.endswith(".crdownload")]
 
                 if downloaded_files:
                     # 获取最新下载的文件
-                    latest_file = max(
-                        downloaded_files,
-                        key=lambda file: os.path.getctime(os.path.join(self.temp_dir.name, file))
-                    )
+                    latest_file = max(downloaded_files, key=lambda entry: entry.stat().st_ctime)
 
-                    # 复制到输出目录
-                    shutil.copy2(
-                        os.path.join(self.temp_dir.name, latest_file),
-                        os.path.join(output_path, self.file_name),
+                    # 移动到输出目录
+                    move_file(
+                        source=latest_file.path,
+                        destination=os.path.join(output_path, self.file_name),
                     )
                     return True
         except TimeoutException:
-            self.logger.error(f"文件下载失败: 下载过程超时 - {self.file_name}")
+            self.logger.error("文件下载失败: 下载过程超时 - %s", self.file_name)
         except NoSuchElementException:
-            self.logger.error(f"文件下载失败: 文件下载元素加载超时 - {self.file_name}")
+            self.logger.error("文件下载失败: 文件下载元素加载超时 - %s", self.file_name)
         except Exception as error:
-            self.logger.error(f"文件下载失败: {self.file_name} - {error}")
+            self.logger.error("文件下载失败: %s - %s", self.file_name, error)
 
         return False
 
 
-    def compress(self, input_path: str, output_path: str, retry=None) -> bool:
+    def local_compression(self, input_path: str, output_path: str) -> bool:
+        """通过本地 ffmpeg 重新编码压缩音频"""
+
+        # 先输出到临时目录，避免中断时残留的文件被误认为已压缩
+        temp_file = os.path.join(self.temp_dir.name, self.file_name)
+        # 设置可变比特率质量时优先使用，否则使用固定比特率
+        rate_control = ["-q:a", str(self.vbr_quality)] if self.vbr_quality is not None else ["-b:a", self.bitrate]
+
+        ffmpeg_command = [
+            self.ffmpeg,
+            "-y", # 覆盖存在文件
+            "-nostats", # 禁用进度信息
+            "-loglevel", "error", # 只输出错误信息
+            "-i", input_path, # 文件输入路径
+            "-map", "0", # 保留音频流与封面
+            "-c:v", "copy", # 封面直接复制
+            "-c:a", "libmp3lame", # MP3编码器
+            *rate_control, # 音频比特率
+            "-map_metadata", "0", # 保留音轨信息
+            "-id3v2_version", "3", # ID3v2.3标签
+            "-threads", str(self.threads), # 限制线程数，避免并发压缩时抢占CPU
+            temp_file, # 文件输出路径
+        ]
+
+        try:
+            command_result = subprocess.run(
+                ffmpeg_command, # 命令列表
+                encoding="utf-8", # 编码格式
+                text=True, # 以文本模式返回输出的结果
+                errors="replace", # 替换解码错误时无效字符
+                stdout=subprocess.DEVNULL, # 丢弃进度输出
+                stderr=subprocess.PIPE, # 只捕获错误信息
+            )
+
+            if command_result.returncode != 0:
+                self.logger.error("本地压缩失败: %s - %s", self.file_name, command_result.stderr[-2000:].strip())
+                return False
+
+            # 移动到输出目录
+            move_file(source=temp_file, destination=os.path.join(output_path, self.file_name))
+            return True
+        except Exception as error:
+            self.logger.error("本地压缩失败: %s - %s", self.file_name, error)
+
+        return False
+
+
+    def compress(self, input_path: str, output_path: str, retry=None, file_id: str | None = None) -> bool:
         """
         压缩音频文件主方法
         :param input_path: 输入文件路径
         :param output_path: 输出目录路径
         :param retry: 重试次数（可选）
+        :param file_id: 预先读取的文件标识符（可选），为空时从文件标签读取
         :return: 压缩结果
         """
 
-        start_time = datetime.now()
+        start_time = time.perf_counter()
 
         if not os.path.isfile(input_path):
-            self.logger.error(f"输入文件路径无效: {input_path}")
+            self.logger.error("输入文件路径无效: %s", input_path)
             return False
 
         if not os.path.isdir(output_path):
-            self.logger.error(f"输出目录路径无效: {output_path}")
+            self.logger.error("输出目录路径无效: %s", output_path)
             return False
 
         if retry is None:
             retry = self.retry
 
+        self.download_link = None
         self.file_name = os.path.basename(input_path)
-        self.logger.info(f"开始压缩音频: {self.file_name}")
+        # 复用的压缩器不沿用上一个文件重试时加倍的超时时间
+        self.timeouts = dict(self.base_timeouts)
+
+        # 输出目录中已有相同标识符的文件时无需重新压缩
+        if file_id is None:
+            file_id = self.get_file_identifier(input_path)
+
+        existing_ids = self.existing_identifiers.get(output_path)
+
+        if existing_ids is None:
+            existing_ids = self.existing_identifiers[output_path] = self.get_existing_identifiers(output_path)
+
+        if file_id in existing_ids:
+            self.logger.info("音频已压缩，跳过本次压缩: %s", self.file_name)
+            return True
+
+        self.logger.info("开始压缩音频: %s", self.file_name)
+
+        # 存在本地 ffmpeg 时无需启动浏览器
+        if self.ffmpeg:
+            if not self.local_compression(input_path, output_path):
+                return False
+
+            existing_ids.add(file_id)
+            self.logger.info("音频压缩完成: %s - 累计时长: %.3f秒", self.file_name, time.perf_counter() - start_time)
+            return True
 
         # 重试机制
         for count in range(1, retry + 1):
             try:
-                # 初始化浏览器
+                # 初始化浏览器，已存在时清除上一个文件的会话后复用
                 if not self.browser:
                     self.init_browser()
+                else:
+                    self.browser.delete_all_cookies()
 
+                self.clear_temp_dir()
                 self.browser.get("https://www.youcompress.com/zh-cn/")
 
                 # 执行压缩流程
@@ -317,35 +620,46 @@ class AudioCompressor:
                 if not self.download_compressed_file(output_path):
                     raise Exception(f"文件下载失败 - {self.file_name}")
 
-                self.logger.info(f"音频压缩下载完成: {self.file_name} - 累计时长: {datetime.now() - start_time}")
+                self.release_browser()
+                existing_ids.add(file_id)
+                self.logger.info("音频压缩下载完成: %s - 累计时长: %.3f秒", self.file_name, time.perf_counter() - start_time)
                 return True
             except Exception as error:
-                # 指数退避等待，上限30秒
-                wait_time = min(5 ** count, 30)
-                self.logger.info(f"等待 {wait_time} 秒后音频压缩启动第 {count} 次重试 - {error}")
+                # 关闭异常的浏览器，重试时重新初始化
+                self.close()
+                self.logger.error("音频压缩失败: %s - %s", self.file_name, error)
+
+                # 最后一次失败后无需等待
+                if count == retry:
+                    break
+
+                # 指数退避等待，超出表长时使用上限
+                wait_time = BACKOFF_TIMES[min(count, len(BACKOFF_TIMES)) - 1]
+                self.logger.info("等待 %s 秒后音频压缩启动第 %s 次重试", wait_time, count)
                 time.sleep(wait_time)
 
                 # 动态调整超时时间，上限5分钟
-                for key in self.timeouts:
-                    self.timeouts[key] = min(self.timeouts[key] * 2, 300)
-            finally:
-                try:
-                    self.browser.quit()
-                except Exception as error:
-                    self.logger.debug(f"浏览器关闭失败: {type(error).__name__}")
-                self.browser = None
+                self.timeouts = {key: min(value * 2, 300) for key, value in self.timeouts.items()}
 
-        self.logger.error(f"音频压缩重试过多，跳过本次压缩: {self.file_name}")
+        self.logger.error("音频压缩重试过多，跳过本次压缩: %s", self.file_name)
         return False
 
 
+    def __enter__(self):
+        return self
+
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """清理资源"""
 
-        if self.browser:
-            self.browser.quit()
+        self.close()
+        if self.observer:
+            self.observer.stop()
+            self.observer.join()
         if self.temp_dir:
             self.temp_dir.cleanup()
+        if self.profile_dir:
+            self.profile_dir.cleanup()
 
 
 # 函数测试
@@ -372,5 +686,5 @@ if __name__ == "__main__":
     }
 
     # 创建压缩器实例
-    compressor = AudioCompressor(config=config, logger=logger)
-    compress_result = compressor.compress(input_file, output_dir)
\ No newline at end of file
+    with AudioCompressor(config=config, logger=logger) as compressor:
+        compress_result = compressor.compress(input_file, output_dir)
\ No newline at end of file
@@ -0,0 +1,46 @@
+# -*- coding:utf-8 -*- #
+
+# Author: YKDX
+# Version: V1.0.257.282
+# Date Creation: 2025/7/30
+# Date Modified: 2025/7/30
+# Program Name: IndexFile
+
+import os, json
+
+
+# 读取索引文件
+def read_index(index_path: str) -> dict:
+    """
+    读取JSON索引文件，读取失败时由调用方记录各自的日志。
+    :param index_path: 索引文件路径。
+    :return: 索引字典，文件不存在时返回空字典。
+    """
+
+    try:
+        with open(mode="r", encoding="utf-8", file=index_path) as file:
+            index = json.load(file)
+    except FileNotFoundError:
+        return {}
+
+    if not isinstance(index, dict):
+        raise ValueError(f"索引格式无效: {type(index).__name__}")
+
+    return index
+
+
+# 保存索引文件
+def write_index(index_path: str, index: dict) -> None:
+    """
+    保存JSON索引文件，先写入临时文件再替换，避免中断时损坏索引。
+    :param index_path: 索引文件路径。
+    :param index: 索引字典。
+    :return: None
+    """
+
+    temp_path = index_path + ".tmp"
+
+    with open(mode="w", encoding="utf-8", file=temp_path) as file:
+        json.dump(index, file, ensure_ascii=False)
+
+    os.replace(temp_path, index_path)
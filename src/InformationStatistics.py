@@ -6,25 +6,47 @@
 # Date Modified: 2025/7/24
 # Program Name: InformationStatistics
 
-import os, logging
+import os, json, time, logging
 from datetime import datetime
 
 # 全局变量
+DEFAULT_FORMAT = "txt"
+# 输出文件的写入缓冲区大小，减少写入系统调用次数
+DEFAULT_BUFFERING = 1 << 20
 DIVIDING_LINE = "-".center(120, "-")
+# 信息统计模板，只在模块加载时解析一次
+TEMPLATE = """\
+        《{title}》 ｜ 《{bvid}》
+        
+        **视频时长** ｜ {duration}
+        **发布日期** ｜ {pubtime}
+        **封面链接** ｜ {cover}
+        
+        **核心数据**
+        播放量: {play}
+        评论数: {reply} -*- 转发数: {share} -*- 弹幕数: {danmaku}
+        点赞数: {thumb_up} -*- 投币数: {coin} -*- 收藏数: {collect}
+    
+        **统计日期** ｜ {current_time}
+    
+        {dividing_line}
+        """
 
 
 # 信息统计
-def information_statistics(data: dict, output_path: str, logger: logging.Logger, dividing_line: str = DIVIDING_LINE) -> None:
+def information_statistics(data: dict, output_path: str, logger: logging.Logger, dividing_line: str = DIVIDING_LINE, output_format: str = DEFAULT_FORMAT) -> None:
     """
     统计B站下载视频的数据信息。
     :param data: 视频数据信息。
     :param logger: 日志记录器。
     :param dividing_line: 分隔线。
     :param output_path: 信息统计文件输出路径。
+    :param output_format: 输出格式，txt 为排版文本，jsonl 为每行一条JSON数据。
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
+    current_date = datetime.now()
 
     # 检查视频数据信息是否为空
     if not data:
@@ -33,43 +55,56 @@ def information_statistics(data: dict, output_path: str, logger: logging.Logger,
 
     # 检查输出路径是否存在
     if not os.path.isdir(output_path):
-        logger.error(f"信息统计文件输出目录无效: {output_path}")
+        logger.error("信息统计文件输出目录无效: %s", output_path)
         return
 
-    file_info = []
-    current_time = datetime.now().strftime("%Y年-%m月-%d日 %H:%M:%S")
-    file_name = "信息统计" + start_time.strftime("%Y-%m-%d") + ".txt"
+    if output_format not in ("txt", "jsonl"):
+        logger.error("无效的信息统计格式: %s - 已自动调整为%s", output_format, DEFAULT_FORMAT)
+        output_format = DEFAULT_FORMAT
 
-    for bvid, video_info in data.items():
-        file_info.append(f"""\
-        《{video_info.get("title", "未知标题")}》 ｜ 《{bvid}》
-        
-        **视频时长** ｜ {video_info.get("duration", "未知时长")}
-        **发布日期** ｜ {video_info.get("pubtime", "未知日期")}
-        **封面链接** ｜ {video_info.get("cover", "未知链接")}
-        
-        **核心数据**
-        播放量: {video_info.get("play", "未知播放量")}
-        评论数: {video_info.get("reply", "未知评论数")} -*- 转发数: {video_info.get("share", "未知转发数")} -*- 弹幕数: {video_info.get("danmaku", "未知弹幕数")}
-        点赞数: {video_info.get("thumb_up", "未知点赞数")} -*- 投币数: {video_info.get("coin", "未知投币数")} -*- 收藏数: {video_info.get("collect", "未知收藏数")}
-    
-        **统计日期** ｜ {current_time}
-    
-        {dividing_line}
-        """)
+    record_count = 0
+    current_time = current_date.strftime("%Y年-%m月-%d日 %H:%M:%S")
+    file_name = "信息统计" + current_date.strftime("%Y-%m-%d") + "." + output_format
 
-    # 输出文件
+    # 输出文件，逐条写入，无需先在内存中拼接全部记录
     try:
-        with open(mode="w", encoding="utf-8", file=os.path.join(output_path, file_name)) as file:
-            file.write("\n".join(file_info))
-
-        logger.info(f"视频信息统计完成 - 共处理 {len(file_info)} 条数据 - 累计时长: {datetime.now() - start_time}")
+        with open(mode="w", encoding="utf-8", buffering=DEFAULT_BUFFERING, file=os.path.join(output_path, file_name)) as file:
+            for bvid, video_info in data.items():
+                # 记录之间以换行分隔
+                if record_count:
+                    file.write("\n")
+
+                record_count += 1
+
+                # 机器可读格式，每行一条数据
+                if output_format == "jsonl":
+                    file.write(json.dumps({"bvid": bvid, **video_info, "statistics_time": current_time}, ensure_ascii=False))
+                    continue
+
+                file.write(TEMPLATE.format(
+                    bvid=bvid,
+                    current_time=current_time,
+                    dividing_line=dividing_line,
+                    title=video_info.get("title", "未知标题"),
+                    duration=video_info.get("duration", "未知时长"),
+                    pubtime=video_info.get("pubtime", "未知日期"),
+                    cover=video_info.get("cover", "未知链接"),
+                    play=video_info.get("play", "未知播放量"),
+                    reply=video_info.get("reply", "未知评论数"),
+                    share=video_info.get("share", "未知转发数"),
+                    danmaku=video_info.get("danmaku", "未知弹幕数"),
+                    thumb_up=video_info.get("thumb_up", "未知点赞数"),
+                    coin=video_info.get("coin", "未知投币数"),
+                    collect=video_info.get("collect", "未知收藏数"),
+                ))
+
+        logger.info("视频信息统计完成 - 共处理 %s 条数据 - 累计时长: %.3f秒", record_count, time.perf_counter() - start_time)
     except FileNotFoundError as path_error:
-        logger.error(f"视频信息统计失败 - 路径无效: {path_error}")
+        logger.error("视频信息统计失败 - 路径无效: %s", path_error)
     except UnicodeEncodeError as encode_error:
-        logger.error(f"视频信息统计失败 - 编码错误: {encode_error}")
+        logger.error("视频信息统计失败 - 编码错误: %s", encode_error)
     except Exception as error:
-        logger.error(f"视频信息统计失败: {error}")
+        logger.error("视频信息统计失败: %s", error)
     pass
 
 
@@ -6,18 +6,97 @@
 # Date Modified: 2025/7/26
 # Program Name: NetworkOperations
 
-import os, time, logging, requests, subprocess
+import os, re, time, random, signal, logging, requests, subprocess
 
-from datetime import datetime
-from fake_useragent import UserAgent
+from urllib3.util import Retry
+from requests.adapters import HTTPAdapter
+
+# 优先使用更快的 orjson 解析响应
+try:
+    import orjson as json
+except ImportError:
+    import json
 
 # 全局变量
 DEFAULT_RETRY = 2
 DEFAULT_PAGE_SIZE = 200
 DEFAULT_CRAWL_TIMEOUT = 5
+DEFAULT_CONNECT_TIMEOUT = 3
 DEFAULT_DOWNLOAD_TIMEOUT = 60
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 30
+DEFAULT_CHUNK_SIZE = 1 << 20
+BVID_PATTERN = re.compile(r"BV[0-9A-Za-z]{10}")
+VIEW_API = "https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
+PLAYURL_API = "https://api.bilibili.com/x/player/playurl?bvid={bvid}&cid={cid}&fnval=16"
+# 视频不存在等永久错误，重试无意义，状态码只匹配HTTP错误信息，避免误匹配文件大小或链接中的数字
+PERMANENT_ERRORS = re.compile(r"HTTP Error 404|Not Found|does not exist|不存在")
 DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36 Edg/134.0.0.0"
 
+# 常用浏览器的UserAgent，请求时随机选取
+USER_AGENTS = (
+    DEFAULT_USER_AGENT,
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/133.0.0.0 Safari/537.36 Edg/133.0.0.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:136.0) Gecko/20100101 Firefox/136.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.3 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/134.0.0.0 Safari/537.36",
+)
+
+# 复用连接的会话，重试时无需重新握手
+SESSION = requests.Session()
+# 连接失败与服务器临时错误在连接池内直接重试，其余响应错误仍由调用方按业务重试
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=Retry(
+    total=2,
+    read=False,
+    raise_on_status=False, # 重试耗尽后返回最后的响应，由调用方记录状态码
+    backoff_factor=DEFAULT_BACKOFF_BASE,
+    allowed_methods=frozenset(["GET"]),
+    status_forcelist=(500, 502, 503, 504),
+)))
+SESSION.headers.update({
+    "Referer": "https://www.bilibili.com", # 防盗链
+    "Origin": "https://www.bilibili.com", # 来源域名
+})
+
+# 重试等待时间
+def backoff_time(count: int, retry_after: str | None = None) -> float:
+    """
+    计算指数退避的等待时间，并加入随机抖动避免同时重试。
+    :param count: 当前重试次数。
+    :param retry_after: 服务器返回的Retry-After响应头。
+    :return: 等待的秒数。
+    """
+
+    # 服务器指定了等待时间时优先遵守
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), DEFAULT_BACKOFF_CAP)
+
+    return min(DEFAULT_BACKOFF_CAP, DEFAULT_BACKOFF_BASE * 2 ** count + random.uniform(0, 0.3))
+
+
+# 终止进程树
+def kill_process_tree(process: subprocess.Popen) -> None:
+    """
+    终止进程及其启动的子进程，避免超时后残留的 ffmpeg 进程继续占用资源。
+    :param process: 以新进程组启动的进程。
+    :return: None
+    """
+
+    try:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+    # 进程组已结束时此调用无副作用，保证直接子进程一定被终止
+    process.kill()
+
+
 # 爬取收藏夹
 def crawl_favorites(fid: str, logger: logging.Logger, retry: int = DEFAULT_RETRY, timeout: int = DEFAULT_CRAWL_TIMEOUT, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
     """
@@ -30,74 +109,151 @@ def crawl_favorites(fid: str, logger: logging.Logger, retry: int = DEFAULT_RETRY
     :return: 返回爬取的收藏夹数据。
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     if not fid:
         logger.error("请正确填写收藏夹的fid")
         return {}
 
     if not 1 <= retry <= 5:
-        logger.error(f"无效的重试次数: {retry} - 最低为1，最高为5 - 已自动调整为{DEFAULT_RETRY}")
+        logger.error("无效的重试次数: %s - 最低为1，最高为5 - 已自动调整为%s", retry, DEFAULT_RETRY)
         retry = DEFAULT_RETRY
 
     if not 0 <= timeout <= 10:
-        logger.error(f"无效的超时时间: {timeout} - 最低为2，最高为10 - 已自动调整为{DEFAULT_CRAWL_TIMEOUT}")
+        logger.error("无效的超时时间: %s - 最低为2，最高为10 - 已自动调整为%s", timeout, DEFAULT_CRAWL_TIMEOUT)
         timeout = DEFAULT_CRAWL_TIMEOUT
 
     if not 1 <= page_size <= 200:
-        logger.error(f"无效的单次页面返回数量: {page_size} - 最低为1，最高为200 - 已自动调整为{DEFAULT_PAGE_SIZE}")
+        logger.error("无效的单次页面返回数量: %s - 最低为1，最高为200 - 已自动调整为%s", page_size, DEFAULT_PAGE_SIZE)
         page_size = DEFAULT_PAGE_SIZE
 
     # B站的api接口
     url = f"https://api.bilibili.com/x/v1/medialist/resource/list?type=3&biz_id={fid}&ps={page_size}"
-    # 随机生成UserAgent
-    user_agent = UserAgent(
-        fallback=DEFAULT_USER_AGENT, # 备用UserAgent
-        min_percentage=0.1, # 过滤使用率小于10%的浏览器版本
-    )
+    retry_after = None
 
     # 重试机制
     for count in range(1, retry + 1):
         try:
-            response = requests.get(
-                url=url, timeout=timeout,
-                headers={
-                    "Referer": "https://www.bilibili.com", # 防盗链
-                    "Origin": "https://www.bilibili.com", # 来源域名
-                    "User-Agent": user_agent.random,  # 随机生成的UserAgent
-                },
+            response = SESSION.get(
+                url=url, timeout=(DEFAULT_CONNECT_TIMEOUT, timeout), # 连接超时与读取超时
+                headers={"User-Agent": random.choice(USER_AGENTS)}, # 随机选取的UserAgent
             )
-            response_result = response.json()
+            retry_after = response.headers.get("Retry-After") if response.status_code == 429 else None
+            response_result = json.loads(response.content)
             response_code = response_result.get("code")
 
             # 检查爬取结果
             if response.status_code == 200 and response_code == 0:
-                logger.info(f"收藏夹 {fid} 数据爬取成功 - 累计时长: {datetime.now() - start_time}")
+                logger.info("收藏夹 %s 数据爬取成功 - 累计时长: %.3f秒", fid, time.perf_counter() - start_time)
                 return response_result
 
-            logger.error(f"收藏夹 {fid} 数据爬取失败 - 状态码: {response.status_code} - 响应代码: {response_code}")
+            logger.error("收藏夹 %s 数据爬取失败 - 状态码: %s - 响应代码: %s", fid, response.status_code, response_code)
         except requests.exceptions.Timeout:
-            logger.error(f"收藏夹 {fid} 数据爬取超时: {timeout}")
+            logger.error("收藏夹 %s 数据爬取超时: %s", fid, timeout)
             timeout += min(2 ** count, 5)
         except ValueError as json_error:
-            logger.error(f"收藏夹 {fid} 数据JSON解析错误: {json_error}")
+            logger.error("收藏夹 %s 数据JSON解析错误: %s", fid, json_error)
         except (requests.exceptions.ConnectionError, requests.exceptions.HTTPError) as network_error:
-            logger.error(f"收藏夹 {fid} 数据爬取时出现网络错误: {network_error}")
+            logger.error("收藏夹 %s 数据爬取时出现网络错误: %s", fid, network_error)
         except Exception as error:
-            logger.error(f"收藏夹 {fid} 数据爬取错误: {error}")
+            logger.error("收藏夹 %s 数据爬取错误: %s", fid, error)
 
-        waiting_time = min(2 ** count, 5)
-        logger.debug(f"等待 {waiting_time} 秒后收藏夹 {fid} 开始第 {count} 次重试")
+        # 最后一次失败后无需等待
+        if count == retry:
+            break
+
+        waiting_time = backoff_time(count=count, retry_after=retry_after)
+        logger.debug("等待 %.2f 秒后收藏夹 %s 开始第 %s 次重试", waiting_time, fid, count)
         time.sleep(waiting_time)
 
-    logger.error(f"收藏夹 {fid} 数据爬取重试次数过多，爬取已停止 - 累计时长: {datetime.now() - start_time}")
+    logger.error("收藏夹 %s 数据爬取重试次数过多，爬取已停止 - 累计时长: %.3f秒", fid, time.perf_counter() - start_time)
     return {}
 
 
+# 请求接口数据
+def request_api(url: str, timeout: int) -> dict:
+    """
+    请求B站的api接口，返回data字段。
+    :param url: 接口链接。
+    :param timeout: 读取超时时间。
+    :return: 接口返回的data字段，响应代码不为0时抛出异常。
+    """
+
+    response = SESSION.get(url=url, timeout=(DEFAULT_CONNECT_TIMEOUT, timeout), headers={"User-Agent": random.choice(USER_AGENTS)})
+    response.raise_for_status()
+    response_result = json.loads(response.content)
+
+    if response_result.get("code") != 0:
+        raise ValueError(f"响应代码: {response_result.get('code')} - {response_result.get('message')}")
+
+    return response_result.get("data") or {}
+
+
+# 解析音频流
+def resolve_stream(bvid: str, timeout: int) -> str:
+    """
+    通过B站的播放接口获取视频的DASH音频流链接。
+    :param bvid: 视频的bvid序列。
+    :param timeout: 读取超时时间。
+    :return: 音频流链接，接口数据无效时抛出异常。
+    """
+
+    cid = request_api(url=VIEW_API.format(bvid=bvid), timeout=timeout).get("cid")
+
+    if not cid:
+        raise ValueError("视频信息中缺少cid")
+
+    audio_streams = (request_api(url=PLAYURL_API.format(bvid=bvid, cid=cid), timeout=timeout).get("dash") or {}).get("audio") or []
+
+    if not audio_streams:
+        raise ValueError("播放信息中没有音频流")
+
+    # 选取码率最高的音频流
+    audio_stream = max(audio_streams, key=lambda stream: stream.get("bandwidth", 0))
+    return audio_stream.get("baseUrl") or audio_stream.get("base_url")
+
+
+# 直接下载音频流
+def stream_download(bvid: str, video_name: str, output_path: str, logger: logging.Logger, timeout: int = DEFAULT_DOWNLOAD_TIMEOUT) -> bool:
+    """
+    直接从B站的CDN下载视频的音频流，无需启动 you-get 进程。
+    :param bvid: 视频的bvid序列。
+    :param logger: 日志记录器。
+    :param video_name: 视频名称。
+    :param timeout: 读取超时时间。
+    :param output_path: 音频流输出路径。
+    :return: 下载是否成功
+    """
+
+    output_file = os.path.join(output_path, f"{video_name}.m4a")
+    # 先写入临时文件，中断时不会留下不完整的音频
+    temp_file = output_file + ".part"
+
+    try:
+        stream_url = resolve_stream(bvid=bvid, timeout=timeout)
+
+        with SESSION.get(url=stream_url, stream=True, timeout=(DEFAULT_CONNECT_TIMEOUT, timeout), headers={"User-Agent": random.choice(USER_AGENTS)}) as response:
+            response.raise_for_status()
+
+            with open(temp_file, mode="wb") as file:
+                for chunk in response.iter_content(chunk_size=DEFAULT_CHUNK_SIZE):
+                    file.write(chunk)
+
+        os.replace(temp_file, output_file)
+        return True
+    except Exception as error:
+        logger.warning("音频流直接下载失败: %s - %s", video_name, error)
+
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+    return False
+
+
 # 下载视频
 def download_video(video_name: str, output_path: str, download_url: str, logger: logging.Logger, retry: int = DEFAULT_RETRY, timeout: int = DEFAULT_DOWNLOAD_TIMEOUT) -> None:
     """
-    通过 you-get 命令行工具下载B站视频。
+    下载B站视频，优先直接下载音频流，失败时通过 you-get 命令行工具下载。
     :param retry: 重试次数。
     :param logger: 日志记录器。
     :param video_name: 视频名称。
@@ -107,20 +263,27 @@ def download_video(video_name: str, output_path: str, download_url: str, logger:
     :return: None
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     if not os.path.isdir(output_path):
-        logger.error(f"视频输出路径无效: {output_path}")
+        logger.error("视频输出路径无效: %s", output_path)
+        return
+
+    if not 30 <= timeout <= 120:
+        logger.error("无效的超时时间: %s - 最低为30，最高为120 - 已自动调整为%s", timeout, DEFAULT_DOWNLOAD_TIMEOUT)
+        timeout = DEFAULT_DOWNLOAD_TIMEOUT
+
+    bvid_match = BVID_PATTERN.search(download_url)
+
+    # 直接下载只需两次接口请求与一次流式下载
+    if bvid_match and stream_download(bvid=bvid_match.group(), video_name=video_name, output_path=output_path, logger=logger, timeout=timeout):
+        logger.debug("音频流下载成功: %s - 累计时长: %.3f秒", video_name, time.perf_counter() - start_time)
         return
 
     # 格式化下载链接
     if "www.bilibili.com/video/" not in download_url:
         download_url = f"www.bilibili.com/video/{download_url}"
 
-    if not 30 <= timeout <= 120:
-        logger.error(f"无效的超时时间: {timeout} - 最低为30，最高为120 - 已自动调整为{DEFAULT_DOWNLOAD_TIMEOUT}")
-        timeout = DEFAULT_DOWNLOAD_TIMEOUT
-
     you_get_command = [
         "you-get",
         download_url, # 下载链接
@@ -132,30 +295,47 @@ def download_video(video_name: str, output_path: str, download_url: str, logger:
     # 重试机制
     for count in range(1, retry + 1):
         try:
-            logger.info(f"开始下载视频: {video_name}")
-            command_result = subprocess.run(
+            logger.info("开始下载视频: %s", video_name)
+            with subprocess.Popen(
                 you_get_command,
-                timeout=timeout, # 超时时间
                 text=True, # 以文本模式返回输出的结果
                 errors="replace", # 替换解码错误时无效字符
                 encoding="utf-8", # 指定输入输出的编码格式
-                capture_output=True # 捕获标准输出和标准错误
-            )
+                stdout=subprocess.DEVNULL, # 丢弃进度输出
+                stderr=subprocess.PIPE, # 只捕获错误信息
+                start_new_session=True, # 独立进程组，超时时可一并终止 you-get 启动的子进程
+            ) as process:
+                try:
+                    _, command_stderr = process.communicate(timeout=timeout)
+                except subprocess.TimeoutExpired:
+                    kill_process_tree(process=process)
+                    process.communicate()
+                    raise
+
+            if process.returncode == 0:
+                logger.debug("视频下载成功: %s - 累计时长: %.3f秒", video_name, time.perf_counter() - start_time)
+                return
+
+            logger.error("视频下载失败: %s - %s", video_name, command_stderr[-2000:].strip())
 
-            if command_result.returncode == 0:
-                logger.debug(f"视频下载成功: {video_name} - 累计时长: {datetime.now() - start_time}")
+            if PERMANENT_ERRORS.search(command_stderr):
+                logger.warning("视频无法访问，已跳过本次下载: %s", video_name)
                 return
         except subprocess.TimeoutExpired as timeout_error:
-            logger.error(f"视频下载失败 - 视频下载超时: {timeout_error}")
+            logger.error("视频下载失败 - 视频下载超时: %s", timeout_error)
         except Exception as error:
-            logger.error(f"视频下载失败: {error}")
+            logger.error("视频下载失败: %s", error)
+
+        # 最后一次失败后无需等待
+        if count == retry:
+            break
 
         timeout += min(3 ** count, 10)
-        waiting_time = min(2 ** count, 5)
-        logger.error(f"等待 {waiting_time} 秒后视频下载启动第 {count} 次重试，当前超时时间 {timeout} 秒")
+        waiting_time = backoff_time(count=count)
+        logger.error("等待 %.2f 秒后视频下载启动第 %s 次重试，当前超时时间 %s 秒", waiting_time, count, timeout)
         time.sleep(waiting_time)
 
-    logger.error(f"视频下载重试过多，已跳过本次下载: {video_name} - 累计时长: {datetime.now() - start_time}")
+    logger.error("视频下载重试过多，已跳过本次下载: %s - 累计时长: %.3f秒", video_name, time.perf_counter() - start_time)
     pass
 
 
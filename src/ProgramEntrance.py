@@ -6,22 +6,23 @@
 # Date Modified: 2025/7/30
 # Program Name: ProgramEntrance
 
-import os, logging
-
-from datetime import datetime
+import os, re, time, logging
 
+from FileCompression import IDENTIFIER_INDEX
 from NetworkOperations import crawl_favorites
 from ConfigurationFile import read_configuration
 from ConfigureLogging import file_log, terminal_log
 from InformationStatistics import information_statistics
-from DataProcessing import name_extraction, data_classification
-from ProgramInitialization import tool_detection, path_initialization
+from DataProcessing import TITLE_INDEX, name_extraction, data_classification
+from ProgramInitialization import TOOL_INDEX, tool_detection, path_initialization
 from ConcurrentTasks import concurrent_process, concurrent_compression
 
 # 全局变量
 START_TIME = 0
 LOGGER = logging.getLogger(__name__)
 DIVIDING_LINE = "-".center(150, "-")
+# ffmpeg 比特率格式，如 128k、1.5M
+BITRATE_PATTERN = re.compile(r"[1-9]\d*(\.\d+)?[kKM]?")
 
 
 class Config:
@@ -31,7 +32,12 @@ class Config:
         self.fid = None
         self.page_size = 200
         self.audio_covers = None
+        self.bitrate = "128k"
+        self.vbr_quality = None
+        self.ffmpeg_threads = 1
+        self.compress_workers = 0
         self.audio_format = "mp3"
+        self.statistics_format = "txt"
         self.log_level = logging.INFO
         self.output_path = os.path.dirname(os.getcwd())
         self.dividing_line = "-".center(150, "-")
@@ -56,6 +62,12 @@ class Config:
             "Copyright": "©EOZT 2021-2025", # 版权信息
             "Author_URL": "https://github.com/EOZT-YKDX", # 作者URL
         }
+        self.concurrency_tuner = {
+            "Initial": 8, # 初始并发数量
+            "Minimum": 2, # 最低并发数量
+            "Maximum": 16, # 最高并发数量
+            "Window": 5, # 吞吐量统计窗口，单位为秒
+        }
         self.timeout_period = {
             "Crawl": 10,
             "File_Compression": {
@@ -97,7 +109,39 @@ class Config:
         self.track_label = config.get("Track_Information", self.track_label)
         self.invalid_labels = config.get("Invalid_Labels", self.invalid_labels)
         self.timeout_period = config.get("Timeout_Period", self.timeout_period)
+        # 配置项留空时读取为None，使用默认配置
+        self.concurrency_tuner = config.get("Concurrency_Tuner") or self.concurrency_tuner
         self.matching_method = config.get("Matching_Method", self.matching_method)
+        self.statistics_format = config.get("Statistics_Format", self.statistics_format)
+
+        bitrate = config.get("Bitrate", self.bitrate)
+        vbr_quality = config.get("VBR_Quality", self.vbr_quality)
+        ffmpeg_threads = config.get("FFmpeg_Threads", self.ffmpeg_threads)
+        compress_workers = config.get("Compress_Workers", self.compress_workers)
+
+        # 以下配置直接作为 ffmpeg 参数，无效时所有转换或压缩都会失败
+        if isinstance(bitrate, str) and BITRATE_PATTERN.fullmatch(bitrate):
+            self.bitrate = bitrate
+        else:
+            LOGGER.warning("无效的压缩比特率: %s - 已自动调整为%s", bitrate, self.bitrate)
+
+        # 可变比特率质量为空时使用固定比特率，否则必须为0-9
+        if vbr_quality is None or (isinstance(vbr_quality, (int, float)) and not isinstance(vbr_quality, bool) and 0 <= vbr_quality <= 9):
+            self.vbr_quality = vbr_quality
+        else:
+            LOGGER.warning("无效的可变比特率质量: %s - 最低为0，最高为9 - 已自动调整为%s", vbr_quality, self.vbr_quality)
+
+        # ffmpeg 线程数为0时自动选择，否则必须为正整数
+        if isinstance(ffmpeg_threads, int) and not isinstance(ffmpeg_threads, bool) and ffmpeg_threads >= 0:
+            self.ffmpeg_threads = ffmpeg_threads
+        else:
+            LOGGER.warning("无效的 ffmpeg 线程数: %s - 已自动调整为%s", ffmpeg_threads, self.ffmpeg_threads)
+
+        # 并发压缩数量为0时自动选择，否则必须为正整数
+        if isinstance(compress_workers, int) and not isinstance(compress_workers, bool) and compress_workers >= 0:
+            self.compress_workers = compress_workers
+        else:
+            LOGGER.warning("无效的并发压缩数量: %s - 已自动调整为%s", compress_workers, self.compress_workers)
 
         if isinstance(config.get("Logger"), dict):
             log_config = config.get("Logger")
@@ -128,7 +172,7 @@ class Config:
 def main():
     global LOGGER, START_TIME, DIVIDING_LINE
 
-    START_TIME = datetime.now()
+    START_TIME = time.perf_counter()
 
     # 初始化配置
     config = Config()
@@ -144,15 +188,18 @@ def main():
     DIVIDING_LINE = config.dividing_line
     file_logger.warning("MusicDownloader 开始运行")
 
-    tools = tool_detection(tools=config.tools, logger=file_logger)
+    tools = tool_detection(tools=config.tools, logger=file_logger, index_path=os.path.join(path_result.get("Data"), TOOL_INDEX))
     crawl_data = crawl_favorites(fid=config.fid, logger=file_logger, retry=config.retry, timeout=config.timeout_period.get("Crawl"), page_size=config.page_size)
-    process_data = data_classification(data=crawl_data, logger=file_logger, input_path=music_path)
+    index_path = os.path.join(path_result.get("Data"), TITLE_INDEX)
+    process_data = data_classification(data=crawl_data, logger=file_logger, input_path=music_path, index_path=index_path)
 
     if process_data:
         process_config = {
             "output_path": music_path,
             "audio_format": config.audio_format,
+            "ffmpeg_threads": config.ffmpeg_threads,
             "url_list": list(process_data.keys()),
+            "concurrency_tuner": config.concurrency_tuner,
             "track_information": config.track_label,
             "name_list": [data.get("title", "未知标题") for data in process_data.values()],
         }
@@ -162,14 +209,24 @@ def main():
             config=process_config,
         )
 
-        information_statistics(data=process_data, logger=file_logger, dividing_line=config.dividing_line, output_path=path_result.get("Data"))
+        information_statistics(data=process_data, logger=file_logger, dividing_line=config.dividing_line, output_path=path_result.get("Data"), output_format=config.statistics_format)
         name_extraction(logger=file_logger, input_path=music_path, filter_labels=config.invalid_labels, matching_method=config.matching_method)
 
     concurrent_compression(
         logger=file_logger,
         input_path=music_path,
         output_path=path_result.get("mus_comp"),
-        config={"edge_driver": tools.get("msedgedriver")},
+        config={
+            "bitrate": config.bitrate,
+            "vbr_quality": config.vbr_quality,
+            "ffmpeg": tools.get("ffmpeg"),
+            "threads": config.ffmpeg_threads,
+            "workers": config.compress_workers,
+            "edge_driver": tools.get("msedgedriver"),
+            # 临时目录与音频目录位于同一磁盘，压缩结果可直接重命名，子目录未配置时使用系统临时目录
+            "temp_root": path_result.get("Temp"),
+            "index_path": os.path.join(path_result.get("Data"), IDENTIFIER_INDEX),
+        },
     )
     pass
 
@@ -178,8 +235,8 @@ if __name__ == "__main__":
     try:
         main()
     except KeyboardInterrupt:
-        LOGGER.warning(f"MusicDownloader 已停止的运行")
+        LOGGER.warning("MusicDownloader 已停止的运行")
     except Exception as error:
-        LOGGER.critical(f"程序崩溃: {error}", exc_info=True)
+        LOGGER.critical("程序崩溃: %s", error, exc_info=True)
     finally:
-        LOGGER.warning(f"MusicDownloader 运行结束 - 累计时长: {datetime.now() - START_TIME}\n{DIVIDING_LINE}")
+        LOGGER.warning("MusicDownloader 运行结束 - 累计时长: %.3f秒\n%s", time.perf_counter() - START_TIME, DIVIDING_LINE)
@@ -6,9 +6,12 @@
 # Date Modified: 2025/7/24
 # Program Name: ProgramInitialization
 
-import os, shutil, logging
+import os, time, shutil, hashlib, logging
 
-from datetime import datetime
+from IndexFile import read_index, write_index
+
+# 全局变量
+TOOL_INDEX = "ToolIndex.json"
 
 
 # 路径初始化
@@ -21,68 +24,74 @@ def path_initialization(directory: dict, output_path: str, logger: logging.Logge
     :return: 初始化后的路径列表。
     """
 
-    start_time = datetime.now()
+    start_time = time.perf_counter()
 
     # 检查输出目录是否存在
     if not os.path.isdir(output_path):
-        logger.error(f"父目录路径无效: {output_path}")
+        logger.error("父目录路径无效: %s", output_path)
         return {}
 
     subdirectory = {}
     parent_dir = os.path.join(output_path, "MusicDownloader")
 
-    # 路径拼接
+    # 路径拼接并创建子目录，已存在的目录不做修改
     for key, value in directory.items():
+        if not isinstance(value, str):
+            logger.error("路径拼接错误 - 非字符串类型的值: %s", value)
+            continue
+
         # 跳过无效的键值对
         if not key or not value.strip():
             continue
 
-        try:
-            subdirectory[key] = os.path.join(parent_dir, value)
-        except TypeError:
-            logger.error(f"路径拼接错误 - 非字符串类型的值: {value}")
-        except Exception as error:
-            logger.error(f"路径拼接错误 - {error}: {value}")
-
-    # 创建子目录
-    for key, value in list(subdirectory.items()):
-        # 跳过存在的子目录
-        if os.path.isdir(value):
-            continue
+        path = os.path.join(parent_dir, value)
 
         try:
-            os.makedirs(value, exist_ok=True)
-            logger.debug(f"已创建目录: {value}")
-            continue
+            os.makedirs(path, exist_ok=True)
+            subdirectory[key] = path
+            logger.debug("目录已就绪: %s", path)
         except NotADirectoryError:
-            logger.error(f"目录创建失败 - 目录名称无效: {value}")
+            logger.error("目录创建失败 - 目录名称无效: %s", path)
         except Exception as error:
-            logger.error(f"目录创建失败 - {error}: {value}")
-
-        # 移除无效的子目录
-        subdirectory.pop(key)
+            logger.error("目录创建失败 - %s: %s", error, path)
 
-    logger.debug(f"路径初始化已完成 - 累计时长: {datetime.now() - start_time}")
+    logger.debug("路径初始化已完成 - 累计时长: %.3f秒", time.perf_counter() - start_time)
     return subdirectory
 
 
 # 工具检测
-def tool_detection(tools: list, logger: logging.Logger) -> dict:
+def tool_detection(tools: list, logger: logging.Logger, index_path: str | None = None) -> dict:
     """
     检测系统环境是否包含依赖工具。
     :param logger: 日志记录器。
     :param tools: 依赖工具列表。
+    :param index_path: 工具索引文件路径，PATH未变化且文件仍存在时直接使用上次找到的工具，只检测其余工具，为空时不使用缓存。
     :return: 依赖工具绝对路径列表。
     """
 
     tool_list = {}
+    cached_tools = {}
     missing_tools = []
     failed, succeed = 0, 0
-    start_time = datetime.now()
+    start_time = time.perf_counter()
+    path_hash = hashlib.blake2b(os.pathsep.join((os.environ.get("PATH", ""), os.environ.get("PATHEXT", ""))).encode(), digest_size=8).hexdigest()
+
+    if index_path:
+        try:
+            tool_index = read_index(index_path=index_path)
+        except Exception as error:
+            logger.warning("工具索引读取失败，将重新检测依赖工具: %s", error)
+            tool_index = {}
+
+        index_tools = tool_index.get("tools")
+
+        # PATH变化后缓存的路径不再可靠
+        if tool_index.get("path_hash") == path_hash and isinstance(index_tools, dict):
+            cached_tools = {tool: path for tool, path in index_tools.items() if isinstance(path, str) and os.path.isfile(path)}
 
     for tool in tools:
-        # 获取命令行工具的绝对路径
-        tool_result = shutil.which(tool)
+        # 获取命令行工具的绝对路径，上次已找到的工具直接使用缓存
+        tool_result = cached_tools.get(tool) or shutil.which(tool)
 
         if not tool_result:
             missing_tools.append(tool)
@@ -91,12 +100,19 @@ def tool_detection(tools: list, logger: logging.Logger) -> dict:
 
         succeed += 1
         tool_list[tool] = tool_result
-        logger.debug(f"{tool} 的绝对路径: {tool_result}")
+        logger.debug("%s 的绝对路径: %s", tool, tool_result)
 
     if missing_tools:
-        logger.error(f"未找到以下依赖工具: {missing_tools}")
+        logger.error("未找到以下依赖工具: %s", missing_tools)
+
+    # 缓存找到的工具，未找到的工具下次运行时重新检测
+    if index_path and tool_list != cached_tools:
+        try:
+            write_index(index_path=index_path, index={"path_hash": path_hash, "tools": tool_list})
+        except Exception as error:
+            logger.warning("工具索引保存失败: %s", error)
 
-    logger.debug(f"依赖工具检测完成 - 成功: {succeed} - 失败: {failed} - 累计时长: {datetime.now() - start_time}")
+    logger.debug("依赖工具检测完成 - 成功: %s - 失败: %s - 累计时长: %.3f秒", succeed, failed, time.perf_counter() - start_time)
     return tool_list
 
 